@@ -1,39 +1,75 @@
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-# --- Telegram Bot ---
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-ADMIN_USER_ID = int(os.getenv("ADMIN_USER_ID")) if os.getenv("ADMIN_USER_ID") else None
-TARGET_CHANNEL_ID = os.getenv("TARGET_CHANNEL_ID")
-
-# --- Telegram User API (для парсинга каналов) ---
-TELEGRAM_API_ID = os.getenv("TELEGRAM_API_ID")
-TELEGRAM_API_HASH = os.getenv("TELEGRAM_API_HASH")
+import sys
+import functools
+from dataclasses import dataclass
+from typing import Optional
 
-# --- AI APIs ---
-MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+from dotenv import load_dotenv
 
-# База данных
-DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///news_bot.db')
-DB_PATH = DATABASE_URL.split('sqlite:///')[-1] if DATABASE_URL.startswith('sqlite:///') else 'news_bot.db'
+# Настройки, не зависящие от окружения, доступны без чтения .env
 
-# Начальный список ключевых слов для заполнения БД
-INITIAL_KEYWORDS = [
+# Начальный список ключевых слов для заполнения БД (неизменяемый, строки интернированы)
+INITIAL_KEYWORDS = tuple(sys.intern(keyword) for keyword in (
     'маркетплейс', 'marketplace', 'ozon', 'wildberries', 'яндекс маркет', 
     'aliexpress', 'amazon', 'ebay', 'lamoda', 'beru', 'avito', 'youla',
     'онлайн-торговля', 'e-commerce', 'интернет-магазин', 'доставка',
     'логистика', 'склад', 'товар', 'продажи', 'комиссия'
-]
-
-# Планировщик
-CHECK_INTERVAL = int(os.getenv('CHECK_INTERVAL', 60))  # в минутах
+))
 
 # Настройки для парсинга
-USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+USER_AGENT = sys.intern('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
 
 # Настройки для генерации изображений
 IMAGE_SIZE = "1024x1024" # Размер для DALL-E 3
 IMAGE_QUALITY = "standard" # standard или hd для DALL-E 3
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Настройки из переменных окружения (.env)."""
+    # --- Telegram Bot ---
+    telegram_bot_token: Optional[str]
+    admin_user_id: Optional[int]
+    target_channel_id: Optional[str]
+    # --- Telegram User API (для парсинга каналов) ---
+    telegram_api_id: Optional[str]
+    telegram_api_hash: Optional[str]
+    # --- AI APIs ---
+    mistral_api_key: Optional[str]
+    openai_api_key: Optional[str]
+    # База данных
+    database_url: str
+    db_path: str
+    # Планировщик
+    check_interval: int  # в минутах
+
+
+@functools.cache
+def _settings() -> Settings:
+    """Загружает .env и читает окружение один раз, при первом обращении к настройке."""
+    load_dotenv()
+    # Снимок окружения после загрузки .env: все значения читаются из него один раз
+    env = os.environ.copy()
+
+    admin_user_id = env.get("ADMIN_USER_ID")
+    database_url = env.get('DATABASE_URL', 'sqlite:///news_bot.db')
+    return Settings(
+        telegram_bot_token=env.get("TELEGRAM_BOT_TOKEN"),
+        admin_user_id=int(admin_user_id) if admin_user_id else None,
+        target_channel_id=env.get("TARGET_CHANNEL_ID"),
+        telegram_api_id=env.get("TELEGRAM_API_ID"),
+        telegram_api_hash=env.get("TELEGRAM_API_HASH"),
+        mistral_api_key=env.get("MISTRAL_API_KEY"),
+        openai_api_key=env.get("OPENAI_API_KEY"),
+        database_url=database_url,
+        db_path=database_url.split('sqlite:///')[-1] if database_url.startswith('sqlite:///') else 'news_bot.db',
+        check_interval=int(env.get('CHECK_INTERVAL', 60)),
+    )
+
+
+def __getattr__(name: str):
+    """Ленивый доступ к настройкам окружения: `from config import TELEGRAM_BOT_TOKEN`."""
+    field = name.lower()
+    if name.isupper() and field in Settings.__dataclass_fields__:
+        return getattr(_settings(), field)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,21 +1,290 @@
+import asyncio
 import sqlite3
-import json
-from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+import orjson
+import zstandard
+from typing import List, Dict, Optional, Set, Tuple
 import logging
+import queue
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache, wraps
+from pathlib import Path
 from urllib.parse import urlparse
 
-from config import DB_PATH, INITIAL_KEYWORDS
+import config
+from config import INITIAL_KEYWORDS
 
 logger = logging.getLogger(__name__)
 
+# Версия схемы: увеличивать при добавлении шагов в _cleanup_and_migrate
+SCHEMA_VERSION = 13
+
+# Текущее время в unix-секундах: все временные метки хранятся как INTEGER
+NOW_EPOCH = "CAST(strftime('%s', 'now') AS INTEGER)"
+
+# Хост и путь URL (без схемы, www., параметров запроса и фрагмента) для _normalize_url_aggressive
+_URL_PARTS_RE = re.compile(r'(?:https?://)?(?:www\.)?([^/?#]*)([^?#]*)')
+
+# Колонки статьи для выборок; original_content хранится сжатым (см. Database._pack_content)
+ARTICLE_COLUMNS = '''
+    na.id, na.source_id, na.original_title, unpack_content(na.original_content) AS original_content,
+    na.original_url, na.rewritten_title, na.rewritten_content, na.hashtags, na.image_url, na.image_path,
+    na.telegram_file_id, na.caption, na.status, na.created_at, na.published_at
+'''
+
+# Экранирование ссылки на источник для HTML-подписи средствами SQLite (& заменяется первым), см. finalize_article
+_SQL_ESCAPED_URL = "replace(replace(replace(original_url, '&', '&amp;'), '<', '&lt;'), '>', '&gt;')"
+
+
+@dataclass(slots=True)
+class NewsSource:
+    """Источник новостей; поля в порядке колонок Database._SOURCE_COLUMNS."""
+    id: int
+    name: str
+    url: str
+    source_type: str
+    is_active: bool
+    last_check: Optional[int]
+
+
 class Database:
-    def __init__(self, db_path: str = DB_PATH):
-        self.db_path = db_path
+    # SQL самых частых запросов. sqlite3 кэширует скомпилированные выражения по тексту запроса,
+    # поэтому одни и те же строки переиспользуют готовую программу VDBE.
+    _SQL_INSERT_ARTICLE = f'''
+        INSERT INTO news_articles
+        (source_id, original_title, original_content, original_url, created_at)
+        VALUES (?, ?, pack_content(?), norm_url(?), {NOW_EPOCH})
+        ON CONFLICT (original_url) DO NOTHING
+        RETURNING id
+    '''
+    # Нормализация URL выполняется в самом SQLite (функция norm_url), уникальность - индексом idx_original_url
+    _SQL_EXISTING_URLS = '''
+        SELECT urls.value FROM json_each(?) AS urls
+        WHERE norm_url(urls.value) IN (SELECT original_url FROM news_articles)
+    '''
+    _SQL_SELECT_PENDING = f'''
+        SELECT {ARTICLE_COLUMNS}, ns.name as source_name
+        FROM news_articles na
+        LEFT JOIN news_sources ns ON na.source_id = ns.id
+        WHERE na.status = 'pending'
+        ORDER BY na.created_at DESC
+        LIMIT ?
+    '''
+    # Колонки в порядке полей NewsSource
+    _SOURCE_COLUMNS = "id, name, url, source_type, is_active, last_check"
+    _SQL_SELECT_SOURCES = f"SELECT {_SOURCE_COLUMNS} FROM news_sources ORDER BY name"
+    _SQL_SELECT_ACTIVE_SOURCES = f"SELECT {_SOURCE_COLUMNS} FROM news_sources WHERE is_active = 1 ORDER BY name"
+    _SQL_SELECT_SOURCE_BY_ID = f"SELECT {_SOURCE_COLUMNS} FROM news_sources WHERE id = ?"
+    _SQL_SELECT_PENDING_PAGE = '''
+        SELECT na.id, na.original_title, na.created_at, ns.name AS source_name
+        FROM news_articles na
+        JOIN news_sources ns ON na.source_id = ns.id
+        WHERE na.status = 'pending'
+        ORDER BY na.created_at DESC
+        LIMIT ? OFFSET ?
+    '''
+    _SQL_UPDATE_STATUS = "UPDATE news_articles SET status = ? WHERE id = ?"
+    _SQL_UPDATE_STATUS_PUBLISHED = f"UPDATE news_articles SET status = ?, published_at = {NOW_EPOCH} WHERE id = ?"
+    _SQL_UPDATE_LAST_CHECK = "UPDATE news_sources SET last_check = ? WHERE id = ?"
+    _SQL_INSERT_KEYWORD = f"INSERT OR IGNORE INTO keywords (keyword, created_at) VALUES (?, {NOW_EPOCH})"
+    # Поля статьи, которые можно обновить через finalize_article
+    _FINALIZE_COLUMNS = frozenset({
+        'rewritten_title', 'rewritten_content', 'hashtags', 'image_url', 'image_path', 'telegram_file_id', 'status'
+    })
+    # Размер кэша скомпилированных выражений на соединение (по умолчанию в sqlite3 - 128)
+    STATEMENT_CACHE_SIZE = 256
+    # Строк в одном многострочном INSERT: 125 * 4 параметра = 500, с запасом ниже лимита SQLite
+    BULK_INSERT_ROWS = 125
+    # Чтение через отображение файла БД в память вместо pread() (256 МБ)
+    MMAP_SIZE = 268435456
+    # Текст статьи короче этого порога (в байтах UTF-8) хранится как есть: на коротком тексте сжатие не окупается
+    CONTENT_COMPRESS_MIN_BYTES = 512
+    ZSTD_LEVEL = 3
+    # Одни и те же ссылки приходят из лент цикл за циклом: результаты norm_url запоминаются
+    NORM_URL_CACHE_SIZE = 16384
+
+    def __init__(self, db_path: Optional[str] = None, read_pool_size: int = 4):
+        # Путь по умолчанию берется из .env только здесь: импорт модуля не читает окружение
+        self.db_path = db_path if db_path is not None else config.DB_PATH
+        # Одно соединение на запись под блокировкой + пул соединений только для чтения.
+        # В режиме WAL читатели не блокируют писателя и друг друга.
+        self._write_lock = threading.RLock()
+        # Общий для всех соединений кэш нормализации (lru_cache потокобезопасен)
+        self._norm_url = lru_cache(maxsize=self.NORM_URL_CACHE_SIZE)(self._normalize_url_aggressive)
+        self._write_conn = self._connect()
+        # Время проверки источников копится в памяти и пишется одной транзакцией за цикл
+        self._pending_last_check: Dict[int, int] = {}
+        # Увеличивается при каждом изменении таблицы keywords: по нему потребители сбрасывают свои кэши
+        self.keywords_version = 0
+        # То же для статей (news_articles): растет при каждой записи, по нему бот сбрасывает кэш статей
+        self.articles_version = 0
+        # Растет только при удалении статей: по нему парсер забывает ссылки, которые считал сохраненными
+        self.articles_deleted_version = 0
         self.init_database()
+        # Читателей открываем после миграции, чтобы они сразу видели итоговую схему и статистику ANALYZE
+        self._read_pool = queue.Queue()
+        for _ in range(read_pool_size):
+            self._read_pool.put(self._connect_reader())
+        self.seed_initial_keywords()
+        # bot_settings - маленькая таблица, которую пишет только этот процесс: держим ее копию в памяти
+        self._settings_cache = self._load_settings()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Открывает соединение для записи и один раз настраивает PRAGMA."""
+        # isolation_level=None - режим autocommit, транзакции открываются явно в _transaction()
+        conn = sqlite3.connect(
+            self.db_path, check_same_thread=False, isolation_level=None,
+            cached_statements=self.STATEMENT_CACHE_SIZE
+        )
+        conn.row_factory = sqlite3.Row
+        # page_size применяется только к новой пустой БД и должен идти до перехода в WAL
+        conn.execute("PRAGMA page_size=8192")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-65536")
+        conn.execute(f"PRAGMA mmap_size={self.MMAP_SIZE}")
+        # Не затирать нулями освобожденные страницы при массовом удалении (в некоторых сборках SQLite включено по умолчанию)
+        conn.execute("PRAGMA secure_delete=OFF")
+        conn.create_function("norm_url", 1, self._norm_url, deterministic=True)
+        self._register_content_functions(conn)
+        return conn
+
+    def _connect_reader(self) -> sqlite3.Connection:
+        """Открывает соединение только для чтения (journal_mode=WAL уже записан в файл БД)."""
+        uri = f"{Path(self.db_path).absolute().as_uri()}?mode=ro"
+        conn = sqlite3.connect(
+            uri, uri=True, check_same_thread=False, isolation_level=None,
+            cached_statements=self.STATEMENT_CACHE_SIZE
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-65536")
+        conn.execute(f"PRAGMA mmap_size={self.MMAP_SIZE}")
+        conn.create_function("norm_url", 1, self._norm_url, deterministic=True)
+        self._register_content_functions(conn)
+        return conn
+
+    def _register_content_functions(self, conn: sqlite3.Connection):
+        """
+        Регистрирует SQL-функции pack_content/unpack_content для хранения original_content.
+        У каждого соединения свои (де)компрессоры: объекты zstandard нельзя делить между потоками,
+        а соединение в каждый момент используется только одним потоком.
+        """
+        compressor = zstandard.ZstdCompressor(level=self.ZSTD_LEVEL)
+        decompressor = zstandard.ZstdDecompressor()
+        conn.create_function("pack_content", 1, lambda value: self._pack_content(compressor, value), deterministic=True)
+        conn.create_function("unpack_content", 1, lambda value: self._unpack_content(decompressor, value), deterministic=True)
+
+    def _pack_content(self, compressor: zstandard.ZstdCompressor, value):
+        """Длинный текст -> BLOB zstd; короткий текст и NULL возвращаются без изменений."""
+        if not isinstance(value, str):
+            return value
+        data = value.encode('utf-8')
+        if len(data) < self.CONTENT_COMPRESS_MIN_BYTES:
+            return value
+        packed = compressor.compress(data)
+        return packed if len(packed) < len(data) else value
+
+    @staticmethod
+    def _unpack_content(decompressor: zstandard.ZstdDecompressor, value):
+        """BLOB zstd -> текст; все остальное возвращается как есть."""
+        if isinstance(value, bytes):
+            return decompressor.decompress(value).decode('utf-8')
+        return value
+
+    @contextmanager
+    def _writer(self):
+        """Курсор соединения для записи под блокировкой."""
+        with self._write_lock:
+            cursor = self._write_conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    @contextmanager
+    def _reader(self):
+        """Курсор свободного соединения из пула читателей."""
+        conn = self._read_pool.get()
+        cursor = conn.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+            self._read_pool.put(conn)
+
+    @contextmanager
+    def _transaction(self):
+        """Курсор писателя внутри явной транзакции: COMMIT при успехе, ROLLBACK при ошибке."""
+        with self._writer() as cursor:
+            # IMMEDIATE сразу берет блокировку записи и исключает SQLITE_BUSY посреди транзакции
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield cursor
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+
+    @staticmethod
+    def _fetch_dicts(cursor: sqlite3.Cursor) -> List[Dict]:
+        """Строки результата как dict; имена колонок берутся из cursor.description один раз на запрос."""
+        columns = [description[0] for description in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def close(self):
+        """Закрывает все соединения с базой данных."""
+        with self._write_lock:
+            if self._write_conn is not None:
+                self.flush_last_check()
+                self.optimize()
+                self._write_conn.close()
+                self._write_conn = None
+        while True:
+            try:
+                self._read_pool.get_nowait().close()
+            except queue.Empty:
+                break
     
+    def optimize(self):
+        """
+        PRAGMA optimize: SQLite сам обновляет статистику ANALYZE для таблиц, где она устарела.
+        Дешевая операция; вызывается при закрытии и после массовых изменений.
+        """
+        with self._writer() as cursor:
+            cursor.execute("PRAGMA optimize")
+
+    def normalize_url(self, url: str) -> str:
+        """Ключ URL в том виде, в каком он хранится в БД (функция norm_url, с кэшем)."""
+        return self._norm_url(url)
+
     def _normalize_url_aggressive(self, url: str) -> str:
-        """Агрессивно нормализует URL для максимальной унификации."""
+        """
+        Агрессивно нормализует URL для максимальной унификации.
+        Разбор строки одним скомпилированным регулярным выражением, без urlparse: функция вызывается
+        для каждой статьи и в миграции. Результат совпадает с _normalize_url_aggressive_slow.
+        """
+        if not url:
+            return ""
+        if not url.isprintable() or ' ' in url or '[' in url or ']' in url:
+            # Пробелы, управляющие символы и IPv6-скобки urlparse обрабатывает по своим правилам
+            return self._normalize_url_aggressive_slow(url)
+        # Схема и www. отбрасываются, параметры запроса и фрагмент не попадают ни в одну группу
+        host, path = _URL_PARTS_RE.match(url).groups()
+        if not path:
+            return host.lower()
+        # Как и urlparse, отрезаем ;params последнего сегмента пути
+        semicolon = path.find(';', path.rfind('/'))
+        if semicolon != -1:
+            path = path[:semicolon]
+        return (host + path.rstrip('/')).lower()
+
+    def _normalize_url_aggressive_slow(self, url: str) -> str:
+        """Исходная реализация нормализации через urlparse (для нестандартных URL)."""
         if not url:
             return ""
         try:
@@ -31,12 +300,11 @@ class Database:
         except Exception:
             return url.lower() # Возвращаем хоть что-то в случае ошибки
 
-    def _cleanup_and_migrate(self, conn):
+    def _cleanup_and_migrate(self, cursor):
         """
         Выполняет все операции по очистке и миграции базы данных в рамках одной транзакции.
-        Этот метод должен вызываться один раз при инициализации.
+        Вызывается при инициализации, только если сохраненная версия схемы отличается от SCHEMA_VERSION.
         """
-        cursor = conn.cursor()
         logger.info("Запуск процесса очистки и миграции базы данных...")
 
         # 1. Миграция: Добавление колонки hashtags (если нужно)
@@ -46,104 +314,236 @@ class Database:
             logger.info("Миграция: Добавление колонки 'hashtags'...")
             cursor.execute("ALTER TABLE news_articles ADD COLUMN hashtags TEXT")
             logger.info("Колонка 'hashtags' успешно добавлена.")
+        # file_id изображения, уже загруженного в Telegram: повторная отправка идет без загрузки файла
+        if 'telegram_file_id' not in columns:
+            cursor.execute("ALTER TABLE news_articles ADD COLUMN telegram_file_id TEXT")
+        # Готовый текст статьи для Telegram, собирается при сохранении рерайта (finalize_article)
+        if 'caption' not in columns:
+            cursor.execute("ALTER TABLE news_articles ADD COLUMN caption TEXT")
+        # Подписи, собранные по прежнему шаблону (Markdown), сбрасываются один раз: бот соберет их заново в HTML
+        cursor.execute("SELECT value FROM bot_settings WHERE key = 'caption_html_done'")
+        if cursor.fetchone() is None:
+            cursor.execute("UPDATE news_articles SET caption = NULL WHERE caption IS NOT NULL")
+            cursor.execute(f'''
+                INSERT OR REPLACE INTO bot_settings (key, value, updated_at)
+                VALUES ('caption_html_done', '1', {NOW_EPOCH})
+            ''')
+
+        # 1a. Валидаторы HTTP-кэша RSS-лент (ETag / Last-Modified) для условных запросов
+        cursor.execute("PRAGMA table_info(news_sources)")
+        source_columns = {col[1] for col in cursor.fetchall()}
+        for column in ('etag', 'last_modified'):
+            if column not in source_columns:
+                cursor.execute(f"ALTER TABLE news_sources ADD COLUMN {column} TEXT")
 
         # 2. Миграция: Нормализация ВСЕХ существующих URL
         logger.info("Миграция: Нормализация существующих URL...")
-        cursor.execute("SELECT id, original_url FROM news_articles")
-        updates = [(self._normalize_url_aggressive(url), article_id) for article_id, url in cursor.fetchall()]
-        if updates:
-            cursor.executemany("UPDATE news_articles SET original_url = ? WHERE id = ?", updates)
-            logger.info(f"Нормализовано {len(updates)} URL.")
-
-        # 3. Очистка: Удаление дубликатов ПОСЛЕ нормализации
-        logger.info("Очистка: Удаление дубликатов...")
+        # norm_url зарегистрирована в соединении: нормализация идет одним UPDATE без выгрузки строк в Python
         cursor.execute('''
-            DELETE FROM news_articles
-            WHERE id NOT IN (
-                SELECT MIN(id) FROM news_articles GROUP BY original_url
-            )
+            UPDATE news_articles
+            SET original_url = norm_url(original_url)
+            WHERE original_url IS NOT norm_url(original_url)
         ''')
         if cursor.rowcount > 0:
-            logger.info(f"Удалено {cursor.rowcount} дубликатов статей.")
+            logger.info(f"Нормализовано {cursor.rowcount} URL.")
+
+        # 3. Очистка: Удаление дубликатов ПОСЛЕ нормализации.
+        # Выполняется один раз: дальше дубли не пропускает UNIQUE индекс.
+        cursor.execute("SELECT value FROM bot_settings WHERE key = 'dedup_v1_done'")
+        if cursor.fetchone() is None:
+            logger.info("Очистка: Удаление дубликатов...")
+            # Обычный индекс по URL (если UNIQUE еще не создан) превращает GROUP BY в проход по индексу,
+            # а подзапрос вычисляется один раз - без повторного сканирования таблицы
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_original_url_dedup ON news_articles (original_url)')
+            cursor.execute('''
+                DELETE FROM news_articles
+                WHERE rowid NOT IN (SELECT MIN(rowid) FROM news_articles GROUP BY original_url)
+            ''')
+            if cursor.rowcount > 0:
+                logger.info(f"Удалено {cursor.rowcount} дубликатов статей.")
+            cursor.execute('DROP INDEX IF EXISTS idx_original_url_dedup')
+            cursor.execute(f'''
+                INSERT OR REPLACE INTO bot_settings (key, value, updated_at)
+                VALUES ('dedup_v1_done', '1', {NOW_EPOCH})
+            ''')
 
         # 4. Установка UNIQUE индекса для предотвращения будущих дублей
         logger.info("Создание UNIQUE индекса для `original_url`...")
         cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_original_url ON news_articles (original_url)')
-        
-        conn.commit()
-        cursor.close()
+
+        # 5. Индексы для выборки очереди модерации (без сортировки в памяти) и для JOIN/удаления по источнику.
+        # Частичный индекс содержит только статьи 'pending': и COUNT, и страница читаются из него,
+        # уже упорядоченными по created_at.
+        cursor.execute('DROP INDEX IF EXISTS idx_status_created')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_pending_created
+            ON news_articles (created_at DESC) WHERE status = 'pending'
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_source ON news_articles (source_id)')
+        # Диапазонное удаление старых статей в delete_old_articles
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_created_at ON news_articles (created_at)')
+
+        # 6. Нормализованная таблица хэштегов с индексом по тегу - для будущих выборок статей по хэштегу
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS article_hashtags (
+                article_id INTEGER NOT NULL,
+                tag TEXT NOT NULL,
+                PRIMARY KEY (article_id, tag)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tag ON article_hashtags (tag)')
+        # Внешние ключи в соединении не включены, поэтому связанные теги удаляет триггер
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_article_hashtags_delete
+            AFTER DELETE ON news_articles
+            BEGIN
+                DELETE FROM article_hashtags WHERE article_id = OLD.id;
+            END
+        ''')
+        # Переносим уже сохраненные JSON-хэштеги средствами JSON1, без разбора в Python
+        cursor.execute('''
+            INSERT OR IGNORE INTO article_hashtags (article_id, tag)
+            SELECT na.id, je.value
+            FROM news_articles na, json_each(na.hashtags) je
+            WHERE json_valid(na.hashtags)
+        ''')
+
+        # 7. Временные метки: текст CURRENT_TIMESTAMP (UTC) -> INTEGER unix-секунды
+        timestamp_columns = {
+            'news_articles': ('created_at', 'published_at'),
+            'news_sources': ('created_at', 'last_check'),
+            'keywords': ('created_at',),
+            'bot_settings': ('updated_at',),
+        }
+        for table, table_columns in timestamp_columns.items():
+            for column in table_columns:
+                cursor.execute(f'''
+                    UPDATE {table}
+                    SET {column} = CAST(strftime('%s', {column}) AS INTEGER)
+                    WHERE typeof({column}) = 'text'
+                ''')
+
+        # 8. Сжатие длинных текстов статей, сохраненных до появления pack_content
+        cursor.execute('''
+            UPDATE news_articles
+            SET original_content = pack_content(original_content)
+            WHERE typeof(original_content) = 'text' AND length(CAST(original_content AS BLOB)) >= ?
+        ''', (self.CONTENT_COMPRESS_MIN_BYTES,))
+
+        # 9. Кэш сгенерированных изображений: точный ключ по хэшу промпта и эмбеддинг для поиска похожих
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS image_cache (
+                prompt_hash TEXT PRIMARY KEY,
+                embedding BLOB,
+                path TEXT NOT NULL,
+                created_at INTEGER DEFAULT ({NOW_EPOCH})
+            )
+        ''')
+
+        # Свежая статистика по всем таблицам и индексам, чтобы планировщик запросов выбирал новые индексы
+        cursor.execute('ANALYZE')
+
         logger.info("Процесс очистки и миграции базы данных завершен.")
 
 
     def init_database(self):
         """Инициализирует базу данных, создает таблицы и запускает очистку."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Создание всех таблиц...
-            # (код создания таблиц news_sources, news_articles, bot_settings, keywords)
-            # ...
+        with self._writer() as cursor:
+            # Базовые таблицы; колонки и индексы, появившиеся позже, добавляет _cleanup_and_migrate
+            cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS news_sources (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    url TEXT NOT NULL UNIQUE,
+                    source_type TEXT NOT NULL, -- 'rss', 'website', 'telegram'
+                    is_active BOOLEAN DEFAULT 1,
+                    last_check INTEGER,
+                    created_at INTEGER DEFAULT ({NOW_EPOCH})
+                )
+            ''')
+            cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS news_articles (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    source_id INTEGER,
+                    original_title TEXT NOT NULL,
+                    original_content TEXT,
+                    original_url TEXT,
+                    rewritten_title TEXT,
+                    rewritten_content TEXT,
+                    hashtags TEXT,
+                    image_url TEXT,
+                    image_path TEXT,
+                    status TEXT DEFAULT 'pending', -- 'pending', 'approved', 'rejected', 'published'
+                    created_at INTEGER DEFAULT ({NOW_EPOCH}),
+                    published_at INTEGER,
+                    FOREIGN KEY (source_id) REFERENCES news_sources (id)
+                )
+            ''')
+            cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS bot_settings (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    updated_at INTEGER DEFAULT ({NOW_EPOCH})
+                )
+            ''')
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS keywords (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     keyword TEXT NOT NULL UNIQUE,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    created_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
                 )
             ''')
-            conn.commit()
-            cursor.close()
-
-        # Выполняем очистку и миграцию в отдельном соединении, чтобы гарантировать commit
-        with sqlite3.connect(self.db_path) as conn:
-            self._cleanup_and_migrate(conn)
 
-        self.seed_initial_keywords()
+        # Очистка и миграция выполняются одной транзакцией и только если схема устарела
+        with self._transaction() as cursor:
+            cursor.execute("SELECT value FROM bot_settings WHERE key = 'schema_version'")
+            row = cursor.fetchone()
+            if row is None or row[0] != str(SCHEMA_VERSION):
+                self._cleanup_and_migrate(cursor)
+                cursor.execute(f'''
+                    INSERT OR REPLACE INTO bot_settings (key, value, updated_at)
+                    VALUES ('schema_version', ?, {NOW_EPOCH})
+                ''', (str(SCHEMA_VERSION),))
 
     def seed_initial_keywords(self):
         """Заполняет таблицу ключевых слов начальными данными из конфига."""
         current_keywords = self.get_keywords()
         if not current_keywords and INITIAL_KEYWORDS:
             logger.info("База данных ключевых слов пуста. Заполняю начальными значениями...")
-            for keyword in INITIAL_KEYWORDS:
-                self.add_keyword(keyword)
+            with self._transaction() as cursor:
+                cursor.executemany(self._SQL_INSERT_KEYWORD, [(keyword.lower(),) for keyword in INITIAL_KEYWORDS])
+            self.keywords_version += 1
             logger.info(f"Добавлено {len(INITIAL_KEYWORDS)} ключевых слов в базу.")
 
     def add_news_source(self, name: str, url: str, source_type: str) -> int:
         """Добавить новый источник новостей"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO news_sources (name, url, source_type)
-                    VALUES (?, ?, ?)
+            with self._writer() as cursor:
+                cursor.execute(f'''
+                    INSERT INTO news_sources (name, url, source_type, created_at)
+                    VALUES (?, ?, ?, {NOW_EPOCH})
+                    RETURNING id
                 ''', (name, url, source_type))
-                return cursor.lastrowid
+                return cursor.fetchone()[0]
         except sqlite3.IntegrityError:
             logger.warning(f"Попытка добавить дублирующийся источник: {url}")
             raise ValueError("Этот URL уже существует в списке источников.")
     
-    def get_news_sources(self, active_only: bool = True) -> List[Dict]:
+    def get_news_sources(self, active_only: bool = True) -> List[NewsSource]:
         """Получить список источников новостей"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            query = "SELECT * FROM news_sources"
-            if active_only:
-                query += " WHERE is_active = 1"
-            query += " ORDER BY name"
-            
-            cursor.execute(query)
-            return [dict(row) for row in cursor.fetchall()]
+        with self._reader() as cursor:
+            # Строки как кортежи: NewsSource собирается позиционно, без промежуточного dict
+            cursor.row_factory = None
+            cursor.execute(self._SQL_SELECT_ACTIVE_SOURCES if active_only else self._SQL_SELECT_SOURCES)
+            return [NewsSource(*row) for row in cursor.fetchall()]
 
-    def get_source_by_id(self, source_id: int) -> Optional[Dict]:
+    def get_source_by_id(self, source_id: int) -> Optional[NewsSource]:
         """Получить источник по ID"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM news_sources WHERE id = ?", (source_id,))
+        with self._reader() as cursor:
+            cursor.row_factory = None
+            cursor.execute(self._SQL_SELECT_SOURCE_BY_ID, (source_id,))
             row = cursor.fetchone()
-            return dict(row) if row else None
+            return NewsSource(*row) if row else None
 
     def update_source_details(self, source_id: int, name: Optional[str] = None, url: Optional[str] = None) -> bool:
         """Обновляет название и/или URL источника."""
@@ -158,17 +558,16 @@ class Database:
             params.append(name)
         
         if url:
-            query_parts.append("url = ?")
+            # Валидаторы HTTP-кэша относятся к старому адресу
+            query_parts.append("url = ?, etag = NULL, last_modified = NULL")
             params.append(url)
         
         params.append(source_id)
         
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
+            with self._writer() as cursor:
                 query = f"UPDATE news_sources SET {', '.join(query_parts)} WHERE id = ?"
                 cursor.execute(query, tuple(params))
-                conn.commit()
                 return cursor.rowcount > 0
         except sqlite3.IntegrityError:
             logger.warning(f"Ошибка обновления: URL '{url}' уже существует.")
@@ -176,165 +575,273 @@ class Database:
 
     def delete_news_source(self, source_id: int):
         """Удалить источник новостей и связанные с ним статьи."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        with self._writer() as cursor:
             # Статьи удалятся автоматически благодаря ON DELETE CASCADE
             cursor.execute("DELETE FROM news_sources WHERE id = ?", (source_id,))
-            conn.commit()
+            self.articles_version += 1
+            self.articles_deleted_version += 1
     
     def get_article_by_id(self, article_id: int) -> Optional[Dict]:
         """Получить одну статью по ее ID."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT na.*, ns.name as source_name
+        with self._reader() as cursor:
+            cursor.execute(f'''
+                SELECT {ARTICLE_COLUMNS}, ns.name as source_name
                 FROM news_articles na
                 LEFT JOIN news_sources ns ON na.source_id = ns.id
                 WHERE na.id = ?
             ''', (article_id,))
-            row = cursor.fetchone()
-            return dict(row) if row else None
+            rows = self._fetch_dicts(cursor)
+            return rows[0] if rows else None
 
     def update_source_last_check(self, source_id: int):
-        """Обновить время последней проверки источника"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE news_sources 
-                SET last_check = CURRENT_TIMESTAMP 
-                WHERE id = ?
-            ''', (source_id,))
+        """Запомнить время последней проверки источника (запись в БД - в flush_last_check)"""
+        with self._write_lock:
+            self._pending_last_check[source_id] = int(time.time())
+
+    def flush_last_check(self):
+        """Записать накопленные времена проверки источников одной транзакцией"""
+        with self._write_lock:
+            if not self._pending_last_check:
+                return
+            pending = [(checked_at, source_id) for source_id, checked_at in self._pending_last_check.items()]
+            self._pending_last_check.clear()
+            with self._transaction() as cursor:
+                cursor.executemany(self._SQL_UPDATE_LAST_CHECK, pending)
     
-    def article_exists(self, original_url: str) -> bool:
-        """Проверить, существует ли статья с таким URL"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id FROM news_articles WHERE original_url = ?", (original_url,))
-            return cursor.fetchone() is not None
+    def get_feed_validators(self) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """ETag и Last-Modified последних ответов RSS-лент: {url источника: (etag, last_modified)}."""
+        with self._reader() as cursor:
+            cursor.execute('''
+                SELECT url, etag, last_modified FROM news_sources
+                WHERE etag IS NOT NULL OR last_modified IS NOT NULL
+            ''')
+            return {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+    def set_feed_validators(self, url: str, etag: Optional[str], last_modified: Optional[str]):
+        """Сохранить ETag и Last-Modified ответа RSS-ленты источника."""
+        with self._writer() as cursor:
+            cursor.execute(
+                "UPDATE news_sources SET etag = ?, last_modified = ? WHERE url = ?",
+                (etag, last_modified, url)
+            )
+
+    def get_cached_image(self, prompt_hash: str) -> Optional[str]:
+        """Путь к изображению, ранее сгенерированному по промпту с этим хэшем."""
+        with self._reader() as cursor:
+            cursor.execute("SELECT path FROM image_cache WHERE prompt_hash = ?", (prompt_hash,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    def get_image_embeddings(self) -> List[Tuple[bytes, str]]:
+        """Эмбеддинги промптов всех закэшированных изображений и пути к ним."""
+        with self._reader() as cursor:
+            cursor.execute("SELECT embedding, path FROM image_cache WHERE embedding IS NOT NULL")
+            return cursor.fetchall()
+
+    def add_cached_image(self, prompt_hash: str, embedding: Optional[bytes], path: str):
+        """Запомнить сгенерированное изображение для промпта."""
+        with self._writer() as cursor:
+            cursor.execute(f'''
+                INSERT OR REPLACE INTO image_cache (prompt_hash, embedding, path, created_at)
+                VALUES (?, ?, ?, {NOW_EPOCH})
+            ''', (prompt_hash, embedding, path))
+
+    def referenced_image_paths(self) -> Set[str]:
+        """
+        Пути ко всем файлам изображений, на которые ссылаются статьи или кэш изображений.
+        Один файл может принадлежать нескольким статьям: удалять с диска можно только файлы вне этого множества.
+        """
+        with self._reader() as cursor:
+            # Бот хранит путь в image_path, планировщик - в image_url
+            cursor.execute('''
+                SELECT image_path FROM news_articles WHERE image_path <> ''
+                UNION SELECT image_url FROM news_articles WHERE image_url <> ''
+                UNION SELECT path FROM image_cache
+            ''')
+            return {row[0] for row in cursor.fetchall()}
+
+    def existing_urls(self, urls: List[str]) -> Set[str]:
+        """Вернуть те URL из списка (в исходном виде), статьи с которыми уже есть в базе; URL сравниваются после norm_url."""
+        if not urls:
+            return set()
+        with self._reader() as cursor:
+            # Весь список передается одним JSON-параметром: текст запроса постоянный и берется из кэша
+            cursor.execute(self._SQL_EXISTING_URLS, (orjson.dumps(list(set(urls))).decode(),))
+            return {row[0] for row in cursor.fetchall()}
 
     def add_news_article(self, source_id: int, original_title: str, 
                         original_content: str, original_url: str) -> Optional[int]:
-        """Добавить новую статью, избегая дубликатов на уровне БД."""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO news_articles 
-                    (source_id, original_title, original_content, original_url)
-                    VALUES (?, ?, ?, ?)
-                ''', (source_id, original_title, original_content, original_url))
-                return cursor.lastrowid
-        except sqlite3.IntegrityError:
+        """Добавить новую статью, избегая дубликатов на уровне БД. URL нормализуется в SQLite (norm_url)."""
+        with self._writer() as cursor:
+            # ON CONFLICT ... RETURNING: id новой статьи или пустой результат для дубликата за один запрос
+            cursor.execute(
+                self._SQL_INSERT_ARTICLE,
+                (source_id, original_title, original_content, original_url)
+            )
+            row = cursor.fetchone()
+            if row is not None:
+                self.articles_version += 1
+        if row is None:
             logger.warning(f"Попытка добавить дублирующуюся статью (отвергнуто базой данных): {original_url}")
             return None
-    
-    def get_pending_articles_paginated(self, page: int = 1, page_size: int = 15) -> (List[Dict], int):
-        """Получить статьи в статусе 'pending' с пагинацией."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+        return row[0]
+
+    def add_news_articles_bulk(self, rows: List[Tuple[int, str, str, str]]) -> int:
+        """
+        Добавить пачку статей одной транзакцией.
+        Каждая строка: (source_id, original_title, original_content, original_url).
+        Дубликаты молча пропускаются UNIQUE индексом. Возвращает количество добавленных статей.
+        """
+        if not rows:
+            return 0
+        inserted = 0
+        with self._transaction() as cursor:
+            # Многострочный INSERT порциями, чтобы не превысить лимит SQLite на число параметров
+            for start in range(0, len(rows), self.BULK_INSERT_ROWS):
+                chunk = rows[start:start + self.BULK_INSERT_ROWS]
+                values = ", ".join([f"(?, ?, pack_content(?), norm_url(?), {NOW_EPOCH})"] * len(chunk))
+                cursor.execute(f'''
+                    INSERT INTO news_articles
+                    (source_id, original_title, original_content, original_url, created_at)
+                    VALUES {values}
+                    ON CONFLICT (original_url) DO NOTHING
+                ''', [value for row in chunk for value in row])
+                inserted += cursor.rowcount
+        # Версия меняется после COMMIT: читатель не закэширует старые данные под новой версией
+        if inserted:
+            self.articles_version += 1
+        return inserted
 
+    def get_pending_articles_paginated(self, page: int = 1, page_size: int = 15) -> Tuple[List[sqlite3.Row], int]:
+        """
+        Получить страницу статей в статусе 'pending' для списка модерации.
+        Выбираются только колонки, нужные списку (без original_content), строки отдаются как sqlite3.Row.
+        """
+        with self._reader() as cursor:
             # Сначала считаем общее количество для пагинации
             cursor.execute("SELECT COUNT(*) FROM news_articles WHERE status = 'pending'")
             total_count = cursor.fetchone()[0]
 
             # Теперь получаем саму страницу
             offset = (page - 1) * page_size
-            cursor.execute('''
-                SELECT na.*, ns.name as source_name
-                FROM news_articles na
-                JOIN news_sources ns ON na.source_id = ns.id
-                WHERE na.status = 'pending'
-                ORDER BY na.created_at DESC
-                LIMIT ? OFFSET ?
-            ''', (page_size, offset))
-            
-            articles = [dict(row) for row in cursor.fetchall()]
-            return articles, total_count
+            cursor.execute(self._SQL_SELECT_PENDING_PAGE, (page_size, offset))
+            return cursor.fetchall(), total_count
     
+    def get_pending_articles(self, limit: Optional[int] = None) -> List[Dict]:
+        """Получить статьи в статусе 'pending', самые новые первыми."""
+        with self._reader() as cursor:
+            cursor.execute(self._SQL_SELECT_PENDING, (limit if limit is not None else -1,))
+            return self._fetch_dicts(cursor)
+
     def update_article_rewrite(self, article_id: int, rewritten_title: str, 
-                              rewritten_content: str, hashtags: List[str]):
-        """Обновить переписанный контент и хэштеги статьи"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            hashtags_json = json.dumps(hashtags, ensure_ascii=False)
-            cursor.execute('''
-                UPDATE news_articles 
-                SET rewritten_title = ?, rewritten_content = ?, hashtags = ?
-                WHERE id = ?
-            ''', (rewritten_title, rewritten_content, hashtags_json, article_id))
-    
+                              rewritten_content: str, hashtags: List[str], caption_head: Optional[str] = None):
+        """Обновить переписанный контент и хэштеги статьи (caption_head - см. finalize_article)"""
+        self.finalize_article(
+            article_id,
+            rewritten_title=rewritten_title,
+            rewritten_content=rewritten_content,
+            hashtags=hashtags,
+            caption_head=caption_head
+        )
+
+    def finalize_article(self, article_id: int, **fields) -> bool:
+        """
+        Обновить несколько полей статьи одним UPDATE в одной транзакции.
+        Допустимые поля - _FINALIZE_COLUMNS; hashtags передается списком строк.
+        caption_head - готовый текст подписи для Telegram без ссылки на источник:
+        ссылку (экранированную для HTML) дописывает SQLite, и результат сохраняется в caption.
+        Возвращает True, если статья найдена.
+        """
+        caption_head = fields.pop('caption_head', None)
+        unknown = set(fields) - self._FINALIZE_COLUMNS
+        if unknown:
+            raise ValueError(f"Недопустимые поля статьи: {', '.join(sorted(unknown))}")
+        if not fields and caption_head is None:
+            return False
+
+        hashtags = fields.get('hashtags')
+        if hashtags is not None:
+            fields['hashtags'] = orjson.dumps(hashtags).decode()
+        assignments = [f"{column} = ?" for column in fields]
+        params = list(fields.values())
+        if fields.get('status') == 'published':
+            assignments.append(f"published_at = {NOW_EPOCH}")
+        if caption_head is not None:
+            # Подпись сохраняется один раз здесь, а не собирается при каждой отправке
+            assignments.append(f"caption = ? || {_SQL_ESCAPED_URL}")
+            params.append(caption_head)
+
+        with self._transaction() as cursor:
+            cursor.execute(
+                f"UPDATE news_articles SET {', '.join(assignments)} WHERE id = ?",
+                (*params, article_id)
+            )
+            updated = cursor.rowcount > 0
+            if hashtags is not None:
+                cursor.execute("DELETE FROM article_hashtags WHERE article_id = ?", (article_id,))
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO article_hashtags (article_id, tag) VALUES (?, ?)",
+                    [(article_id, tag) for tag in hashtags]
+                )
+        self.articles_version += 1
+        return updated
+
     def update_article_image(self, article_id: int, image_url: str, image_path: str):
-        """Обновить изображение статьи"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE news_articles 
-                SET image_url = ?, image_path = ?
-                WHERE id = ?
-            ''', (image_url, image_path, article_id))
+        """Обновить изображение статьи (file_id старого изображения в Telegram сбрасывается)"""
+        self.finalize_article(article_id, image_url=image_url, image_path=image_path, telegram_file_id=None)
     
     def update_article_status(self, article_id: int, status: str):
         """Обновить статус статьи"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            if status == 'published':
-                cursor.execute('''
-                    UPDATE news_articles 
-                    SET status = ?, published_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (status, article_id))
-            else:
-                cursor.execute('''
-                    UPDATE news_articles 
-                    SET status = ?
-                    WHERE id = ?
-                ''', (status, article_id))
+        query = self._SQL_UPDATE_STATUS_PUBLISHED if status == 'published' else self._SQL_UPDATE_STATUS
+        with self._writer() as cursor:
+            cursor.execute(query, (status, article_id))
+            self.articles_version += 1
     
     def get_setting(self, key: str) -> Optional[str]:
-        """Получить настройку"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT value FROM bot_settings WHERE key = ?', (key,))
-            result = cursor.fetchone()
-            return result[0] if result else None
+        """Получить настройку (из кэша в памяти, без обращения к БД)"""
+        return self._settings_cache.get(key)
     
     def set_setting(self, key: str, value: str):
-        """Установить настройку"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
+        """Установить настройку (запись в БД и в кэш)"""
+        with self._writer() as cursor:
+            cursor.execute(f'''
                 INSERT OR REPLACE INTO bot_settings (key, value, updated_at)
-                VALUES (?, ?, CURRENT_TIMESTAMP)
+                VALUES (?, ?, {NOW_EPOCH})
             ''', (key, value))
+            self._settings_cache[key] = value
+
+    def _load_settings(self) -> Dict[str, str]:
+        """Читает таблицу bot_settings целиком для кэша настроек."""
+        with self._reader() as cursor:
+            cursor.execute("SELECT key, value FROM bot_settings")
+            return {key: value for key, value in cursor.fetchall()}
     
     # --- Методы для управления ключевыми словами ---
     
     def get_keywords(self) -> List[str]:
         """Получить все ключевые слова из базы данных."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        with self._reader() as cursor:
             cursor.execute("SELECT keyword FROM keywords ORDER BY keyword")
             return [row[0] for row in cursor.fetchall()]
 
     def add_keyword(self, keyword: str) -> bool:
         """Добавить новое ключевое слово. Возвращает True, если успешно."""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("INSERT INTO keywords (keyword) VALUES (?)", (keyword.lower(),))
-                return True
-        except sqlite3.IntegrityError:
-            logger.warning(f"Ключевое слово '{keyword}' уже существует в базе.")
-            return False
+        with self._writer() as cursor:
+            cursor.execute(self._SQL_INSERT_KEYWORD, (keyword.lower(),))
+            if cursor.rowcount == 0:
+                logger.warning(f"Ключевое слово '{keyword}' уже существует в базе.")
+                return False
+            self.keywords_version += 1
+            return True
     
     def delete_keyword(self, keyword: str) -> bool:
         """Удалить ключевое слово. Возвращает True, если успешно."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        with self._writer() as cursor:
             cursor.execute("DELETE FROM keywords WHERE keyword = ?", (keyword.lower(),))
-            return cursor.rowcount > 0
+            if cursor.rowcount == 0:
+                return False
+            self.keywords_version += 1
+            return True
 
     def delete_duplicate_articles(self) -> int:
         """
@@ -351,61 +858,80 @@ class Database:
         По умолчанию удаляет статьи старше 7 дней.
         Возвращает количество удаленных статей.
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Используем datetime('now', '-X days') для определения пороговой даты
-            # Это надежный способ для работы с датами в SQLite
-            cursor.execute(
-                "DELETE FROM news_articles WHERE created_at < datetime('now', ?)",
-                (f'-{days_old} days',)
-            )
+        # Порог в unix-секундах считается один раз; DELETE идет по диапазону индекса idx_created_at
+        threshold = int(time.time()) - days_old * 86400
+        with self._transaction() as cursor:
+            cursor.execute("DELETE FROM news_articles WHERE created_at < ?", (threshold,))
             
             deleted_count = cursor.rowcount
-            conn.commit()
+            # Срок хранения кэша изображений тот же: файлы без ссылок потом удаляет OpenAIClient.delete_unused_images
+            cursor.execute("DELETE FROM image_cache WHERE created_at < ?", (threshold,))
             
-            if deleted_count > 0:
-                logger.info(f"Плановая очистка: удалено {deleted_count} статей старше {days_old} дней.")
-            else:
-                logger.info(f"Плановая очистка: не найдено статей старше {days_old} дней для удаления.")
-                
-            return deleted_count
+        if deleted_count > 0:
+            self.articles_version += 1
+            self.articles_deleted_version += 1
+            logger.info(f"Плановая очистка: удалено {deleted_count} статей старше {days_old} дней.")
+        else:
+            logger.info(f"Плановая очистка: не найдено статей старше {days_old} дней для удаления.")
+            
+        return deleted_count
 
     def delete_article(self, article_id: int) -> bool:
         """Удаляет статью из базы данных по ее ID."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            try:
+        try:
+            with self._writer() as cursor:
                 cursor.execute("DELETE FROM news_articles WHERE id = ?", (article_id,))
-                conn.commit()
-                logger.info(f"Статья с ID {article_id} удалена из базы данных.")
-                return cursor.rowcount > 0
-            except sqlite3.Error as e:
-                logger.error(f"Ошибка при удалении статьи с ID {article_id}: {e}")
-                conn.rollback()
-                return False
-            finally:
-                cursor.close()
+                deleted = cursor.rowcount > 0
+                if deleted:
+                    self.articles_version += 1
+                    self.articles_deleted_version += 1
+            logger.info(f"Статья с ID {article_id} удалена из базы данных.")
+            return deleted
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка при удалении статьи с ID {article_id}: {e}")
+            return False
 
     def clear_all_articles(self) -> int:
         """
         Удаляет ВСЕ статьи из базы данных.
         Возвращает количество удаленных статей.
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            try:
+        try:
+            with self._transaction() as cursor:
                 cursor.execute("SELECT COUNT(*) FROM news_articles")
                 total_count = cursor.fetchone()[0]
                 
                 cursor.execute("DELETE FROM news_articles")
-                conn.commit()
                 
-                logger.info(f"Полная очистка базы: удалено {total_count} статей.")
-                return total_count
-            except sqlite3.Error as e:
-                logger.error(f"Ошибка при полной очистке базы: {e}")
-                conn.rollback()
-                return 0
-            finally:
-                cursor.close()
+            self.articles_version += 1
+            self.articles_deleted_version += 1
+            logger.info(f"Полная очистка базы: удалено {total_count} статей.")
+            return total_count
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка при полной очистке базы: {e}")
+            return 0
+
+
+
+class AsyncDatabase:
+    """
+    Асинхронная обертка над Database для обработчиков бота.
+    Каждый метод Database вызывается через asyncio.to_thread, поэтому запросы и fsync
+    не блокируют цикл событий: `await db.get_article_by_id(article_id)`.
+    """
+    def __init__(self, db: Database):
+        self.sync = db
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.sync, name)
+        if not callable(attr):
+            return attr
+
+        @wraps(attr)
+        async def call_in_thread(*args, **kwargs):
+            return await asyncio.to_thread(attr, *args, **kwargs)
+
+        # Обертка кэшируется в экземпляре: следующие обращения находят ее без __getattr__.
+        # Атрибуты-значения (например, articles_version) не кэшируются и читаются заново каждый раз
+        setattr(self, name, call_in_thread)
+        return call_in_thread
@@ -0,0 +1,31 @@
+"""
+Настройка логирования приложения (файл + консоль)
+"""
+
+import logging
+import sys
+from logging.handlers import RotatingFileHandler
+
+
+def setup_logging():
+    """Подключает обработчики к корневому логгеру. Повторный вызов ничего не меняет."""
+    root_logger = logging.getLogger()
+    # Защита от дублирования: каждая запись иначе выводилась бы по нескольку раз
+    if root_logger.handlers:
+        return
+
+    log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+
+    # Логирование в файл
+    file_handler = RotatingFileHandler('news_bot.log', maxBytes=5*1024*1024, backupCount=2, encoding='utf-8')
+    file_handler.setFormatter(log_formatter)
+    file_handler.setLevel(logging.INFO)
+
+    # Логирование в консоль
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(log_formatter)
+    console_handler.setLevel(logging.INFO)
+
+    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(file_handler)
+    root_logger.addHandler(console_handler)
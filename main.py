@@ -6,9 +6,12 @@
 import logging
 import sys
 import os
-from logging.handlers import RotatingFileHandler
 
-from dotenv import load_dotenv
+try:
+    # Более быстрый event loop на базе libuv (на Windows недоступен)
+    import uvloop
+except ImportError:
+    uvloop = None
 
 from config import (
     TELEGRAM_BOT_TOKEN, ADMIN_USER_ID, TARGET_CHANNEL_ID,
@@ -22,25 +25,9 @@ from openai_client import OpenAIClient
 from telegram_client import TelegramScraperClient
 from scheduler import NewsScheduler
 from telegram_bot import NewsBot
+from log_setup import setup_logging
 
-# --- Настройка логирования ---
-log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
-
-# Логирование в файл
-file_handler = RotatingFileHandler('news_bot.log', maxBytes=5*1024*1024, backupCount=2, encoding='utf-8')
-file_handler.setFormatter(log_formatter)
-file_handler.setLevel(logging.INFO)
-
-# Логирование в консоль
-console_handler = logging.StreamHandler(sys.stdout)
-console_handler.setFormatter(log_formatter)
-console_handler.setLevel(logging.INFO)
-
-# Создание корневого логгера
-root_logger = logging.getLogger()
-root_logger.setLevel(logging.INFO)
-root_logger.addHandler(file_handler)
-root_logger.addHandler(console_handler)
+setup_logging()
 
 logger = logging.getLogger(__name__)
 
@@ -62,9 +49,10 @@ def check_env_vars():
 
 def main():
     """Основная функция для запуска бота."""
-    scraper = None  # Инициализируем scraper как None
+    news_scraper = None  # Инициализируем news_scraper как None
+    db = None
     try:
-        # Переменные окружения уже загружаются в config.py
+        # Переменные окружения загружаются в config.py при первом обращении
         logger.info("Инициализация приложения...")
 
         # Проверка ключевых переменных
@@ -73,9 +61,10 @@ def main():
 
         # --- 3. Инициализация компонентов ---
         logger.info("Инициализация компонентов...")
+        # Один экземпляр Database на все приложение: миграция и пул соединений создаются один раз
         db = Database()
-        mistral_client = MistralClient()
-        openai_client = OpenAIClient()
+        mistral_client = MistralClient(db)
+        openai_client = OpenAIClient(db)
         
         telegram_scraper_client = None
         if TELEGRAM_API_ID and TELEGRAM_API_HASH:
@@ -104,9 +93,15 @@ def main():
         sys.exit(1)
     finally:
         # Корректно закрываем Selenium WebDriver при выходе
-        if scraper:
-            scraper.close()
+        if news_scraper:
+            news_scraper.close()
+        # Сбрасываем отложенные записи и обновляем статистику SQLite (PRAGMA optimize)
+        if db:
+            db.close()
         logger.info("Приложение завершило работу.")
 
 if __name__ == "__main__":
+    if uvloop is not None:
+        # Политика event loop действует и на бота, и на asyncio.run() в потоке планировщика
+        uvloop.install()
     main()
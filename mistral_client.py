@@ -1,8 +1,14 @@
+import asyncio
+import hashlib
 import json
 import logging
-from typing import Dict, List
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 
-from bs4 import BeautifulSoup
+import httpx
+from selectolax.lexbor import LexborHTMLParser
 from mistralai.client import MistralClient as MistralAIClient
 from mistralai.models.chat_completion import ChatMessage
 
@@ -11,31 +17,12 @@ from database import Database
 
 logger = logging.getLogger(__name__)
 
-
-class MistralClient:
-    def __init__(self):
-        # API ключ теперь обычно подхватывается автоматически из переменных окружения
-        # библиотекой mistralai. Оставляем проверку для надежности.
-        if not MISTRAL_API_KEY:
-            raise ValueError("MISTRAL_API_KEY не установлен в переменных окружения")
-
-        self.client = MistralAIClient(api_key=MISTRAL_API_KEY)
-        # Загружаем ключевые слова один раз при инициализации
-        self.db = Database()
-        self.keywords = self.db.get_keywords()
-        if not self.keywords:
-            logger.warning("Список ключевых слов в базе данных пуст. Рерайт может быть не совсем точным.")
-            # Можно задать базовый набор по умолчанию, если это необходимо
-            self.keywords = ['маркетплейс', 'e-commerce', 'онлайн-торговля']
-
-    def rewrite_news_article(self, title: str, content: str) -> Dict[str, str]:
-        """Переписать новостную статью в удобном формате с помощью Mistral."""
-        try:
-            prompt = f"""
-Перепиши следующую новость (тема: {", ".join(self.keywords)}) в удобном и привлекательном формате для публикации в Telegram канале:
-
-ЗАГОЛОВOК: {title}
-СОДЕРЖАНИЕ: {content}
+# Шаблоны запросов собираются один раз при импорте; в вызове подставляются только переменные части.
+# Неизменная часть (инструкции и формат ответа) идет первой, а данные статьи - в конце:
+# так одинаковый префикс запросов попадает в кэш промптов на стороне провайдера.
+_REWRITE_SYSTEM_PROMPT = "Ты эксперт по переписыванию новостей о маркетплейсах и e-commerce. Твоя задача - создавать привлекательный и информативный контент для социальных сетей. Всегда отвечай только в формате JSON."
+_REWRITE_TMPL = """
+Перепиши новость, приведенную в конце, в удобном и привлекательном формате для публикации в Telegram канале.
 
 ТРЕБОВАНИЯ:
 1. Создай новый заголовок (до 100 символов), который будет привлекательным и информативным.
@@ -50,50 +37,19 @@ class MistralClient:
     "content": "переписанное содержание",
     "hashtags": ["#хэштег1", "#хэштег2", "#хэштег3"]
 }}
-"""
-            messages = [
-                ChatMessage(role="system", content="Ты эксперт по переписыванию новостей о маркетплейсах и e-commerce. Твоя задача - создавать привлекательный и информативный контент для социальных сетей. Всегда отвечай только в формате JSON."),
-                ChatMessage(role="user", content=prompt)
-            ]
 
-            response = self.client.chat(
-                model="mistral-small-latest",
-                messages=messages,
-                response_format={"type": "json_object"}
-            )
+ТЕМА: {topics}
 
-            result_text = response.choices[0].message.content
-            result_json = json.loads(result_text)
-            
-            return {
-                'title': result_json.get('title', title),
-                'content': result_json.get('content', content),
-                'hashtags': result_json.get('hashtags', [])
-            }
-
-        except Exception as e:
-            logger.error(f"Ошибка при переписывании статьи с помощью Mistral: {e}")
-            return {'title': title, 'content': content, 'hashtags': []}
-
-    def find_articles_on_page(self, page_html: str, base_url: str) -> List[Dict]:
-        """Использует Mistral для поиска новостных статей на HTML-странице."""
-        try:
-            soup = BeautifulSoup(page_html, 'html.parser')
-            for tag in soup(['script', 'style', 'svg', 'nav', 'footer', 'header', 'form']):
-                tag.decompose()
-            
-            body_text = soup.get_text(separator='\n', strip=True)
-            
-            max_chars = 15000
-            if len(body_text) > max_chars:
-                body_text = body_text[:max_chars]
-
-            prompt = f"""
+ЗАГОЛОВOК: {title}
+СОДЕРЖАНИЕ: {content}
+"""
+_FIND_ARTICLES_SYSTEM_PROMPT = "Ты - AI-ассистент, который преобразует текст с веб-страниц в структурированные JSON-данные, находя новостные статьи. Всегда отвечай только в формате JSON."
+_FIND_ARTICLES_TMPL = """
 Проанализируй следующий текстовый контент, извлеченный из HTML-страницы. Твоя задача - найти все новостные статьи или анонсы.
 
 Для каждой найденной статьи извлеки:
 1. `title` (заголовок)
-2. `url` (полная ссылка на статью, если есть относительная - дополни ее базовым URL: {base_url})
+2. `url` (полная ссылка на статью, если есть относительная - дополни ее базовым URL, указанным ниже)
 3. `summary` (краткое описание или первый абзац)
 
 Игнорируй рекламные блоки, навигационные меню и другой нерелевантный контент.
@@ -110,25 +66,204 @@ class MistralClient:
   ]
 }}
 
+Базовый URL: {base_url}
+
 Вот текстовое содержимое для анализа:
 {body_text}
 """
-            messages = [
-                ChatMessage(role="system", content="Ты - AI-ассистент, который преобразует текст с веб-страниц в структурированные JSON-данные, находя новостные статьи. Всегда отвечай только в формате JSON."),
-                ChatMessage(role="user", content=prompt)
-            ]
+
+# Системные сообщения не меняются и переиспользуются во всех запросах
+_REWRITE_SYSTEM_MESSAGE = ChatMessage(role="system", content=_REWRITE_SYSTEM_PROMPT)
+_REWRITE_SYSTEM_DICT = {"role": "system", "content": _REWRITE_SYSTEM_PROMPT}
+_FIND_ARTICLES_SYSTEM_MESSAGE = ChatMessage(role="system", content=_FIND_ARTICLES_SYSTEM_PROMPT)
+_FIND_ARTICLES_SYSTEM_DICT = {"role": "system", "content": _FIND_ARTICLES_SYSTEM_PROMPT}
+
+
+class MistralClient:
+    # Теги, которые вырезаются из страницы перед отправкой текста в Mistral
+    # (список, а не кортеж: этого требует LexborHTMLParser.strip_tags)
+    STRIP_TAGS = ['script', 'style', 'svg', 'nav', 'footer', 'header', 'form']
+    MAX_PAGE_CHARS = 15000
+    # Сколько последних результатов анализа страниц держать в памяти
+    PAGE_CACHE_SIZE = 256
+    REWRITE_MODEL = "mistral-small-latest"
+    FIND_ARTICLES_MODEL = "mistral-large-latest"
+    # Асинхронный рерайт идет напрямую в HTTP API, минуя синхронный слой SDK
+    CHAT_COMPLETIONS_URL = "https://api.mistral.ai/v1/chat/completions"
+    MAX_CONCURRENT_REQUESTS = 8
+    HTTP_TIMEOUT = 120.0
+
+    def __init__(self, db: Database):
+        # API ключ теперь обычно подхватывается автоматически из переменных окружения
+        # библиотекой mistralai. Оставляем проверку для надежности.
+        if not MISTRAL_API_KEY:
+            raise ValueError("MISTRAL_API_KEY не установлен в переменных окружения")
+
+        self.client = MistralAIClient(api_key=MISTRAL_API_KEY)
+        # Загружаем ключевые слова один раз при инициализации
+        self.db = db
+        self.keywords = self.db.get_keywords()
+        if not self.keywords:
+            logger.warning("Список ключевых слов в базе данных пуст. Рерайт может быть не совсем точным.")
+            # Можно задать базовый набор по умолчанию, если это необходимо
+            self.keywords = ['маркетплейс', 'e-commerce', 'онлайн-торговля']
+        self._topics = ", ".join(self.keywords)
+        # Результаты find_articles_on_page по хэшу текста страницы: неизменившаяся страница не уходит в Mistral повторно
+        self._page_cache: "OrderedDict[str, List[Dict]]" = OrderedDict()
+
+    def _page_text(self, page_html: str) -> str:
+        """Текст страницы без скриптов, стилей и навигации, обрезанный до MAX_PAGE_CHARS по границе слова."""
+        tree = LexborHTMLParser(page_html)
+        # Удаление всех ненужных тегов вместе с содержимым за один проход по дереву, без CSS-селектора
+        tree.strip_tags(self.STRIP_TAGS, recursive=True)
+        root = tree.body or tree.root
+        body_text = root.text(separator='\n', strip=True) if root is not None else ''
+        if len(body_text) <= self.MAX_PAGE_CHARS:
+            return body_text
+        body_text = body_text[:self.MAX_PAGE_CHARS]
+        # Не отправлять в модель обрубок последнего слова
+        boundary = max(body_text.rfind(' '), body_text.rfind('\n'))
+        return body_text[:boundary] if boundary > 0 else body_text
+
+    def _rewrite_messages(self, title: str, content: str) -> List[Dict[str, str]]:
+        """Сообщения для запроса рерайта статьи в формате HTTP API."""
+        return [_REWRITE_SYSTEM_DICT, {"role": "user", "content": self._rewrite_prompt(title, content)}]
+
+    def _rewrite_prompt(self, title: str, content: str) -> str:
+        """Текст запроса на рерайт: в готовый шаблон подставляются только тема, заголовок и содержание."""
+        return _REWRITE_TMPL.format_map({'topics': self._topics, 'title': title, 'content': content})
+
+    @staticmethod
+    def _parse_rewrite(result_text: str, title: str, content: str) -> Dict[str, str]:
+        """Разбирает JSON-ответ рерайта, подставляя оригинал для отсутствующих полей."""
+        result_json = json.loads(result_text)
+        return {
+            'title': result_json.get('title', title),
+            'content': result_json.get('content', content),
+            'hashtags': result_json.get('hashtags', [])
+        }
+
+    def rewrite_news_article(self, title: str, content: str) -> Dict[str, str]:
+        """Переписать новостную статью в удобном формате с помощью Mistral."""
+        try:
+            messages = [_REWRITE_SYSTEM_MESSAGE, ChatMessage(role="user", content=self._rewrite_prompt(title, content))]
 
             response = self.client.chat(
-                model="mistral-large-latest",
+                model=self.REWRITE_MODEL,
+                messages=messages,
+                response_format={"type": "json_object"}
+            )
+
+            return self._parse_rewrite(response.choices[0].message.content, title, content)
+
+        except Exception as e:
+            logger.error(f"Ошибка при переписывании статьи с помощью Mistral: {e}")
+            return {'title': title, 'content': content, 'hashtags': []}
+
+    async def rewrite_news_article_async(self, http: httpx.AsyncClient, semaphore: asyncio.Semaphore,
+                                         title: str, content: str) -> Dict[str, str]:
+        """Асинхронный рерайт одной статьи напрямую через HTTP API Mistral."""
+        try:
+            async with semaphore:
+                response = await http.post(self.CHAT_COMPLETIONS_URL, json={
+                    "model": self.REWRITE_MODEL,
+                    "messages": self._rewrite_messages(title, content),
+                    "response_format": {"type": "json_object"}
+                })
+            response.raise_for_status()
+            return self._parse_rewrite(response.json()['choices'][0]['message']['content'], title, content)
+
+        except Exception as e:
+            logger.error(f"Ошибка при переписывании статьи с помощью Mistral: {e}")
+            return {'title': title, 'content': content, 'hashtags': []}
+
+    @asynccontextmanager
+    async def rewrite_session(self) -> AsyncIterator[Callable[[str, str], Awaitable[Dict[str, str]]]]:
+        """
+        Сессия рерайта: отдает корутинную функцию rewrite(title, content) -> результат рерайта.
+        Все вызовы внутри сессии делят HTTP-клиент, одновременно выполняется не больше MAX_CONCURRENT_REQUESTS.
+        """
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
+        async with self._http_client() as http:
+            yield partial(self.rewrite_news_article_async, http, semaphore)
+
+    def _http_client(self) -> httpx.AsyncClient:
+        """HTTP-клиент для пакета запросов: соединения переиспользуются, а клиент не переживает свой event loop."""
+        return httpx.AsyncClient(http2=True, timeout=self.HTTP_TIMEOUT,
+                                 headers={"Authorization": f"Bearer {MISTRAL_API_KEY}"})
+
+    def _find_articles_request(self, page_html: str, base_url: str) -> Tuple[str, str, Optional[List[Dict]]]:
+        """Ключ кэша, текст запроса и сохраненный результат (или None) для анализа страницы."""
+        body_text = self._page_text(page_html)
+
+        # Ключ кэша - текст страницы, а не сырой HTML: разметка динамических страниц меняется от запроса к запросу
+        cache_key = hashlib.blake2b(f"{base_url}\n{body_text}".encode(), digest_size=16).hexdigest()
+        cached = self._page_cache.get(cache_key)
+        if cached is not None:
+            self._page_cache.move_to_end(cache_key)
+            logger.info(f"Страница {base_url} не изменилась, использую сохраненный результат анализа.")
+            return cache_key, '', cached
+
+        prompt = _FIND_ARTICLES_TMPL.format_map({'base_url': base_url, 'body_text': body_text})
+        return cache_key, prompt, None
+
+    def _store_page_result(self, cache_key: str, result_text: str) -> List[Dict]:
+        """Разбирает ответ анализа страницы и кладет его в LRU-кэш."""
+        articles = json.loads(result_text).get("articles", [])
+        self._page_cache[cache_key] = articles
+        if len(self._page_cache) > self.PAGE_CACHE_SIZE:
+            self._page_cache.popitem(last=False)
+        return articles
+
+    def find_articles_on_page(self, page_html: str, base_url: str) -> List[Dict]:
+        """Использует Mistral для поиска новостных статей на HTML-странице."""
+        try:
+            cache_key, prompt, cached = self._find_articles_request(page_html, base_url)
+            if cached is not None:
+                return cached
+
+            messages = [_FIND_ARTICLES_SYSTEM_MESSAGE, ChatMessage(role="user", content=prompt)]
+
+            response = self.client.chat(
+                model=self.FIND_ARTICLES_MODEL,
                 messages=messages,
                 response_format={"type": "json_object"}
             )
             
-            result_text = response.choices[0].message.content
-            data = json.loads(result_text)
-            
-            return data.get("articles", [])
+            return self._store_page_result(cache_key, response.choices[0].message.content)
 
         except Exception as e:
             logger.error(f"Ошибка при анализе страницы с помощью Mistral: {e}")
             return []
+
+    async def find_articles_on_page_async(self, http: httpx.AsyncClient, semaphore: asyncio.Semaphore,
+                                          page_html: str, base_url: str) -> List[Dict]:
+        """Асинхронный анализ одной страницы напрямую через HTTP API Mistral."""
+        try:
+            cache_key, prompt, cached = self._find_articles_request(page_html, base_url)
+            if cached is not None:
+                return cached
+
+            async with semaphore:
+                response = await http.post(self.CHAT_COMPLETIONS_URL, json={
+                    "model": self.FIND_ARTICLES_MODEL,
+                    "messages": [_FIND_ARTICLES_SYSTEM_DICT, {"role": "user", "content": prompt}],
+                    "response_format": {"type": "json_object"}
+                })
+            response.raise_for_status()
+            return self._store_page_result(cache_key, response.json()['choices'][0]['message']['content'])
+
+        except Exception as e:
+            logger.error(f"Ошибка при анализе страницы {base_url} с помощью Mistral: {e}")
+            return []
+
+    async def find_articles_on_pages(self, pages: List[Tuple[str, str]]) -> List[List[Dict]]:
+        """
+        Проанализировать несколько страниц параллельно. pages - пары (HTML, базовый URL),
+        результаты возвращаются в том же порядке. Одновременно выполняется не больше MAX_CONCURRENT_REQUESTS запросов.
+        """
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
+        async with self._http_client() as http:
+            return await asyncio.gather(*(
+                self.find_articles_on_page_async(http, semaphore, page_html, base_url) for page_html, base_url in pages
+            ))
@@ -1,12 +1,15 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import feedparser
+import functools
+import ahocorasick
 import re
-from bs4 import BeautifulSoup
-from typing import List, Dict, Optional
+from selectolax.lexbor import LexborHTMLParser, LexborNode
+from typing import List, Dict, Optional, Set, Tuple
 import logging
 from datetime import datetime, timedelta
 import asyncio
-import aiohttp
 from urllib.parse import urljoin, urlparse
 import time
 from selenium import webdriver
@@ -22,17 +25,89 @@ from telegram_client import TelegramScraperClient
 
 logger = logging.getLogger(__name__)
 
+# Регулярные выражения clean_text компилируются один раз.
+# Тег не может содержать '<': одиночный '<' в тексте не поглощает все до следующего тега
+# и не дает квадратичного перебора на строках вида '<<<<'.
+HTML_TAG_RE = re.compile(r'<[^<>]+>')
+NON_ALLOWED_CHARS_RE = re.compile(r'[^\w\s.,!?:\-()]+')
+
+
+@functools.lru_cache(maxsize=8)
+def build_keyword_automaton(keywords: tuple) -> ahocorasick.Automaton:
+    """
+    Собирает ключевые слова в автомат Ахо-Корасик: текст проверяется за один проход
+    независимо от числа слов. Как и `keyword in text.lower()`, ищет вхождение подстроки
+    без учета регистра (текст перед поиском нужно привести к нижнему регистру).
+    """
+    automaton = ahocorasick.Automaton()
+    for keyword in keywords:
+        automaton.add_word(keyword.lower(), keyword)
+    automaton.make_automaton()
+    return automaton
+
+
 class NewsScraper:
+    # Специализированные парсеры известных сайтов: hostname -> имя метода (tree, base_url) -> статьи
+    SITE_PARSERS = {
+        'shoppers.media': '_parse_shoppers_media',
+        'www.shoppers.media': '_parse_shoppers_media',
+    }
+    # Признак того, что в HTML уже есть новостные блоки (иначе контент, вероятно, рисуется JavaScript)
+    NEWS_MARKER_SELECTOR = "article, .news, .post, .entry, [class*='news-'], [class*='post-']"
+    # Ответы больше этого (байт) обрезаются: защита памяти от гигантских страниц
+    MAX_RESPONSE_BYTES = 5_000_000
+    RESPONSE_CHUNK_SIZE = 65536
+    # Тайм-ауты (подключение, чтение): на мертвом хосте быстро сдаемся, медленному даем дочитать
+    HTTP_TIMEOUT = (5, 30)
+    # Пул соединений requests.Session (по умолчанию urllib3 держит 10 на хост) и повторы при сбоях
+    HTTP_POOL_SIZE = 50
+    HTTP_RETRIES = 3
+    HTTP_RETRY_BACKOFF = 0.3
+    HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+    # Ресурсы, которые Selenium не загружает: для поиска статей нужен только DOM
+    SELENIUM_BLOCKED_URLS = [
+        '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+        '*.woff', '*.woff2', '*.ttf', '*.css',
+        '*analytics*', '*gtag*', '*googletagmanager*', '*mc.yandex.ru*'
+    ]
+    # Не дольше этого (сек.) держим кэш ключевых слов: ловит правки таблицы в обход Database
+    KEYWORDS_CACHE_TTL = 60
+    # Сколько ссылок, уже сохраненных в БД, помнить между циклами (при переполнении набор сбрасывается)
+    KNOWN_URLS_LIMIT = 50_000
+
     def __init__(self, mistral_client: MistralClient, db: Database, telegram_client: Optional[TelegramScraperClient]):
         self.session = requests.Session()
         self.session.headers.update({'User-Agent': USER_AGENT})
+        retry = Retry(
+            total=self.HTTP_RETRIES,
+            backoff_factor=self.HTTP_RETRY_BACKOFF,
+            status_forcelist=self.HTTP_RETRY_STATUSES,
+            # После исчерпания попыток вернуть последний ответ: его статус проверит raise_for_status()
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=self.HTTP_POOL_SIZE, pool_maxsize=self.HTTP_POOL_SIZE, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         self._driver = None
+        self._telegram_lock: Optional[asyncio.Lock] = None
+        self._telegram_lock_loop: Optional[asyncio.AbstractEventLoop] = None
+        # Автомат ключевых слов и версия списка слов в БД, по которой он собран
+        self._keywords_automaton = None
+        self._keywords_version: Optional[int] = None
+        self._keywords_loaded_at = 0.0
+        # Ссылки (после norm_url), статьи с которыми уже есть в БД: такие записи пропускаем до очистки
+        # текста и фильтра. Множество сбрасывается, когда статьи удаляются из БД (articles_deleted_version)
+        self._known_urls: Set[str] = set()
+        self._known_urls_version = db.articles_deleted_version
+        # ETag / Last-Modified RSS-лент и страниц сайтов по URL источника; загружаются из БД при первом запросе
+        self._feed_validators: Optional[Dict[str, Tuple[Optional[str], Optional[str]]]] = None
         self.mistral = mistral_client
         self.db = db
         self.telegram_client = telegram_client
         
     def close(self):
-        """Закрывает Selenium WebDriver, если он был инициализирован."""
+        """Закрывает HTTP-сессию и Selenium WebDriver, если он был инициализирован."""
+        self.session.close()
         if self._driver:
             try:
                 self._driver.quit()
@@ -42,6 +117,23 @@ class NewsScraper:
             finally:
                 self._driver = None
 
+    def _get_limited(self, url: str, headers: Optional[Dict[str, str]] = None) -> Tuple[requests.Response, bytes]:
+        """
+        GET с потоковым чтением тела не больше MAX_RESPONSE_BYTES.
+        Тело читается только у успешных ответов; статус проверяет вызывающий код.
+        """
+        with self.session.get(url, headers=headers, timeout=self.HTTP_TIMEOUT, stream=True) as response:
+            if not response.ok:
+                return response, b''
+            body = bytearray()
+            for chunk in response.iter_content(self.RESPONSE_CHUNK_SIZE):
+                body.extend(chunk)
+                if len(body) > self.MAX_RESPONSE_BYTES:
+                    logger.warning(f"Ответ {url} больше {self.MAX_RESPONSE_BYTES} байт, читаю только начало.")
+                    del body[self.MAX_RESPONSE_BYTES:]
+                    break
+            return response, bytes(body)
+
     def _get_selenium_driver(self):
         """Инициализирует и возвращает Selenium WebDriver."""
         if self._driver is None:
@@ -57,10 +149,15 @@ class NewsScraper:
             # Игнорирование ошибок SSL
             chrome_options.add_argument('--ignore-certificate-errors')
             chrome_options.add_argument('--allow-insecure-localhost')
+            # driver.get() возвращает управление после DOMContentLoaded, не дожидаясь картинок и т.п.
+            chrome_options.page_load_strategy = 'eager'
 
             try:
                 self._driver = webdriver.Chrome(options=chrome_options)
                 self._driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+                # Блокировка тяжелых ресурсов через CDP действует на все страницы этой вкладки
+                self._driver.execute_cdp_cmd('Network.enable', {})
+                self._driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.SELENIUM_BLOCKED_URLS})
             except Exception as e:
                 logger.error(f"Не удалось инициализировать Selenium WebDriver: {e}")
                 logger.error("Убедитесь, что Google Chrome установлен в системе.")
@@ -75,51 +172,118 @@ class NewsScraper:
             
             # Умное ожидание появления одного из типичных контейнеров для новостей
             wait = WebDriverWait(driver, 15) # Ждем до 15 секунд
-            wait.until(EC.presence_of_element_located(
-                (By.CSS_SELECTOR, "article, .news, .post, .entry, [class*='news-'], [class*='post-']"))
-            )
+            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, self.NEWS_MARKER_SELECTOR)))
             
             return driver.page_source
         except Exception as e:
             logger.error(f"Ошибка при получении динамического HTML с {url} (возможно, тайм-аут ожидания контента): {e}")
             return ""
 
+    def _get_page_source(self, url: str) -> Tuple[Optional[str], Tuple[Optional[str], Optional[str]]]:
+        """
+        Получает HTML страницы: сначала обычным условным запросом, и только если в ответе
+        нет новостных блоков - через Selenium с выполнением JavaScript.
+        Возвращает (HTML, (etag, last_modified)); HTML равен None, если страница не изменилась (304),
+        и пустой строке при ошибке. Валидаторы есть только у страницы, взятой без Selenium.
+        """
+        try:
+            response, body = self._get_limited(url, headers=self._conditional_headers(url))
+            if response.status_code == 304:
+                logger.info(f"Страница {url} не изменилась с прошлой проверки.")
+                return None, (None, None)
+            response.raise_for_status()
+            # Кодировка как у requests.Response.text: из заголовка, иначе UTF-8
+            html = body.decode(response.encoding or 'utf-8', errors='replace')
+            if LexborHTMLParser(html).css_first(self.NEWS_MARKER_SELECTOR) is not None:
+                return html, (response.headers.get('ETag'), response.headers.get('Last-Modified'))
+            logger.info(f"В статическом HTML {url} нет новостных блоков, загружаю через Selenium")
+        except requests.RequestException as e:
+            logger.warning(f"Не удалось получить {url} обычным запросом, пробую Selenium: {e}")
+        return self._get_dynamic_page_source(url), (None, None)
+
     def is_marketplace_related(self, text: str) -> bool:
         """Проверить, относится ли текст к маркетплейсам, используя ключевые слова из БД."""
-        text_lower = text.lower()
-        keywords = self.db.get_keywords()
-        if not keywords:
+        automaton = self._keyword_automaton()
+        if automaton is None:
             # Если в базе нет слов, возвращаем True, чтобы не отфильтровать всё
             return True
-        return any(keyword in text_lower for keyword in keywords)
+        return next(automaton.iter(text.lower()), None) is not None
+
+    def remember_urls(self, urls) -> None:
+        """Запомнить ссылки, статьи с которыми уже сохранены в БД (вызывает планировщик)."""
+        self._sync_known_urls()
+        if len(self._known_urls) > self.KNOWN_URLS_LIMIT:
+            self._known_urls.clear()
+        # Храним ключи в том же виде, что и БД (norm_url): разные написания одной ссылки совпадают
+        self._known_urls.update(self.db.normalize_url(url) for url in urls)
+
+    def _known_url(self, url: str) -> bool:
+        """True, если статья с этой ссылкой (с точностью до norm_url) уже есть в БД."""
+        self._sync_known_urls()
+        return self.db.normalize_url(url) in self._known_urls
+
+    def _sync_known_urls(self):
+        """Забывает запомненные ссылки, если после их запоминания статьи удалялись из БД."""
+        version = self.db.articles_deleted_version
+        if version != self._known_urls_version:
+            self._known_urls.clear()
+            self._known_urls_version = version
+
+    def marketplace_related_mask(self, texts: List[str]) -> List[bool]:
+        """Пакетный вариант is_marketplace_related: автомат запрашивается один раз на весь список."""
+        automaton = self._keyword_automaton()
+        if automaton is None:
+            return [True] * len(texts)
+        return [next(automaton.iter(text.lower()), None) is not None for text in texts]
+
+    def _keyword_automaton(self):
+        """Автомат по ключевым словам из БД; пересобирается при изменении списка слов или по истечении TTL."""
+        version = self.db.keywords_version
+        now = time.monotonic()
+        if self._keywords_version != version or now - self._keywords_loaded_at > self.KEYWORDS_CACHE_TTL:
+            keywords = tuple(self.db.get_keywords())
+            self._keywords_automaton = build_keyword_automaton(keywords) if keywords else None
+            self._keywords_version = version
+            self._keywords_loaded_at = now
+        return self._keywords_automaton
     
-    def _parse_shoppers_media(self, soup: BeautifulSoup, base_url: str) -> List[Dict]:
+    @staticmethod
+    def _find_descendant(element: LexborNode, selector: str) -> Optional[LexborNode]:
+        """Первый потомок, подходящий под селектор. Сам element не учитывается (как BeautifulSoup.find)."""
+        for node in element.css(selector):
+            if node != element:
+                return node
+        return None
+
+    def _parse_shoppers_media(self, tree: LexborHTMLParser, base_url: str) -> List[Dict]:
         """Специализированный парсер для shoppers.media."""
         articles = []
         # Ищем основной контейнер для новостей
-        news_container = soup.find('div', class_='infinite-container')
+        news_container = tree.css_first('div.infinite-container')
         if not news_container:
             return []
         
         # Находим все карточки новостей
-        news_cards = news_container.find_all('div', class_='news-card')
+        news_cards = news_container.css('div.news-card')
         
         for card in news_cards:
-            title_element = card.find('div', class_='news-card__title')
-            link_element = card.find('a', class_='news-card__link')
-            subtitle_element = card.find('div', class_='news-card__subtitle')
+            title_element = self._find_descendant(card, 'div.news-card__title')
+            link_element = self._find_descendant(card, 'a.news-card__link[href]')
+            subtitle_element = self._find_descendant(card, 'div.news-card__subtitle')
 
-            if title_element and link_element and link_element.has_attr('href'):
-                title = title_element.get_text(strip=True)
-                url = urljoin(base_url, link_element['href'])
+            if title_element and link_element:
+                title = title_element.text(strip=True)
+                url = urljoin(base_url, link_element.attributes['href'] or '')
+                if self._known_url(url):
+                    continue
                 # Используем подзаголовок как основной контент, если он есть
-                content = subtitle_element.get_text(strip=True) if subtitle_element else ''
+                content = subtitle_element.text(strip=True) if subtitle_element else ''
 
                 # Проверяем релевантность, хотя на странице тега это может быть излишним
                 if title and self.is_marketplace_related(title + ' ' + content):
                     articles.append({
-                        'title': self.clean_text(title),
-                        'content': self.clean_text(content),
+                        'title': self._clean_text_plain(title),
+                        'content': self._clean_text_plain(content),
                         'url': url,
                         'published': None
                     })
@@ -131,38 +295,48 @@ class NewsScraper:
             return ""
         
         # Удаляем HTML теги
-        text = re.sub(r'<[^>]+>', '', text)
-        # Удаляем лишние пробелы и переносы строк
-        text = re.sub(r'\s+', ' ', text)
+        return self._clean_text_plain(HTML_TAG_RE.sub('', text))
+
+    def _clean_text_plain(self, text: str) -> str:
+        """clean_text без удаления тегов: для текста, уже извлеченного из DOM (node.text())"""
+        if not text:
+            return ""
+        
+        # Удаляем лишние пробелы и переносы строк (split() по тем же пробельным символам, что и \s)
+        text = ' '.join(text.split())
         # Удаляем специальные символы
-        text = re.sub(r'[^\w\s\.\,\!\?\:\-\(\)]', '', text)
+        text = NON_ALLOWED_CHARS_RE.sub('', text)
         
         return text.strip()
     
     def extract_text_from_html(self, html: str) -> str:
         """Извлечь текст из HTML"""
-        soup = BeautifulSoup(html, 'html.parser')
+        tree = LexborHTMLParser(html)
         
-        # Удаляем скрипты и стили
-        for script in soup(["script", "style"]):
-            script.decompose()
+        # Удаляем скрипты и стили вместе с содержимым
+        tree.strip_tags(['script', 'style'], recursive=True)
         
         # Получаем текст
-        text = soup.get_text()
-        return self.clean_text(text)
+        text = tree.root.text() if tree.root is not None else ''
+        return self._clean_text_plain(text)
     
     def scrape_website_with_mistral(self, url: str) -> List[Dict]:
-        """Использует Selenium для получения HTML и Mistral для его анализа."""
+        """Получает HTML (при необходимости через Selenium) и анализирует его с помощью Mistral."""
         logger.info(f"Использую Mistral для анализа сайта: {url}")
-        html_content = self._get_dynamic_page_source(url)
+        html_content, validators = self._get_page_source(url)
         if not html_content:
             return []
 
-        mistral_articles = self.mistral.find_articles_on_page(html_content, url)
-        
+        articles = self._mistral_articles(self.mistral.find_articles_on_page(html_content, url), url)
+        # Пустой ответ может означать ошибку Mistral: тогда страницу нужно скачать и разобрать еще раз
+        if articles:
+            self._store_validators(url, *validators)
+        return articles
+
+    def _mistral_articles(self, mistral_articles: List[Dict], url: str) -> List[Dict]:
+        """Преобразует результат анализа страницы Mistral в наш стандартный формат статей."""
         articles = []
         for article_data in mistral_articles:
-            # Преобразуем результат от GPT в наш стандартный формат
             articles.append({
                 'title': self.clean_text(article_data.get('title', '')),
                 'content': self.clean_text(article_data.get('summary', '')),
@@ -172,54 +346,144 @@ class NewsScraper:
         
         return articles
 
+    def scrape_websites(self, urls: List[str]) -> Dict[str, List[Dict]]:
+        """
+        Парсинг нескольких сайтов: известные сайты разбираются своими парсерами,
+        а страницы остальных уходят в Mistral одним параллельным пакетом вместо запроса на каждую.
+        """
+        results = {}
+        pages = []
+        for url in urls:
+            if self._site_parser(url):
+                results[url] = self.scrape_website(url)
+                continue
+            # Страницы загружаются по очереди: Selenium WebDriver один и не потокобезопасен
+            logger.info(f"Использую Mistral для анализа сайта: {url}")
+            html_content, validators = self._get_page_source(url)
+            if html_content:
+                pages.append((html_content, url, validators))
+            else:
+                results[url] = []
+
+        if pages:
+            try:
+                found = asyncio.run(self.mistral.find_articles_on_pages([(html, url) for html, url, _ in pages]))
+            except Exception as e:
+                logger.error(f"Ошибка пакетного анализа страниц с помощью Mistral: {e}")
+                found = [[] for _ in pages]
+            for (_, url, validators), mistral_articles in zip(pages, found):
+                results[url] = self._mistral_articles(mistral_articles, url)
+                if results[url]:
+                    self._store_validators(url, *validators)
+        return results
+
     def scrape_rss_feed(self, url: str) -> List[Dict]:
-        """Парсинг RSS ленты"""
+        """Парсинг RSS ленты (условный GET: неизменившаяся лента отвечает 304 без тела)"""
         try:
-            feed = feedparser.parse(url)
-            articles = []
-            
-            for entry in feed.entries:
-                # Проверяем, что статья свежая (не старше 24 часов)
-                if hasattr(entry, 'published_parsed') and entry.published_parsed:
-                    pub_date = datetime(*entry.published_parsed[:6])
-                    if datetime.now() - pub_date > timedelta(hours=24):
-                        continue
-                
-                title = entry.get('title', '')
-                content = entry.get('summary', '') or entry.get('description', '')
-                link = entry.get('link', '')
-                
-                # Проверяем релевантность
-                if self.is_marketplace_related(title + ' ' + content):
-                    articles.append({
-                        'title': self.clean_text(title),
-                        'content': self.clean_text(content),
-                        'url': link,
-                        'published': pub_date if hasattr(entry, 'published_parsed') and entry.published_parsed else None
-                    })
-            
-            return articles
-            
+            response, body = self._get_limited(url, headers=self._conditional_headers(url))
+            if response.status_code == 304:
+                logger.info(f"RSS {url} не изменилась с прошлой проверки.")
+                return []
+            response.raise_for_status()
+            return self._parse_feed_response(
+                url, body, response.headers.get('Content-Type'),
+                response.headers.get('ETag'), response.headers.get('Last-Modified')
+            )
         except Exception as e:
             logger.error(f"Ошибка при парсинге RSS {url}: {e}")
             return []
+
+    def _conditional_headers(self, url: str) -> Dict[str, str]:
+        """Заголовки If-None-Match / If-Modified-Since по сохраненным валидаторам ленты или страницы."""
+        if self._feed_validators is None:
+            self._feed_validators = self.db.get_feed_validators()
+        etag, last_modified = self._feed_validators.get(url, (None, None))
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def _parse_feed_response(self, url: str, body: bytes, content_type: Optional[str],
+                             etag: Optional[str], last_modified: Optional[str]) -> List[Dict]:
+        """Разбирает скачанную ленту и запоминает ее валидаторы для следующего условного запроса."""
+        # content-location - база для относительных ссылок, как при загрузке ленты самим feedparser
+        response_headers = {'content-location': url}
+        if content_type:
+            response_headers['content-type'] = content_type
+        articles = self._articles_from_feed(feedparser.parse(body, response_headers=response_headers))
+        # Валидаторы сохраняются только после успешного разбора, иначе следующий 304 скрыл бы непрочитанные статьи
+        self._store_validators(url, etag, last_modified)
+        return articles
+
+    def _store_validators(self, url: str, etag: Optional[str], last_modified: Optional[str]):
+        """Запоминает валидаторы ответа источника (в памяти и в БД), если они изменились."""
+        if self._feed_validators is None:
+            self._feed_validators = self.db.get_feed_validators()
+        if self._feed_validators.get(url, (None, None)) != (etag, last_modified):
+            self._feed_validators[url] = (etag, last_modified)
+            self.db.set_feed_validators(url, etag, last_modified)
+
+    def _articles_from_feed(self, feed) -> List[Dict]:
+        """Отбирает из разобранной ленты свежие (не старше 24 часов) и релевантные статьи."""
+        # Порог свежести один на всю ленту (статьи не старше 24 часов)
+        cutoff = datetime.now() - timedelta(hours=24)
+        candidates = []
+        for entry in feed.entries:
+            link = entry.get('link', '')
+            # Уже сохраненная статья: не тратим время на дату, фильтр и очистку текста
+            if self._known_url(link):
+                continue
+            pub_date = None
+            if hasattr(entry, 'published_parsed') and entry.published_parsed:
+                pub_date = datetime(*entry.published_parsed[:6])
+                if pub_date < cutoff:
+                    continue
+            
+            title = entry.get('title', '')
+            content = entry.get('summary', '') or entry.get('description', '')
+            candidates.append((title, content, link, pub_date))
+        
+        # Проверяем релевантность всех статей ленты разом
+        relevant = self.marketplace_related_mask([f"{title} {content}" for title, content, _, _ in candidates])
+        articles = []
+        for (title, content, link, pub_date), is_relevant in zip(candidates, relevant):
+            if is_relevant:
+                articles.append({
+                    'title': self.clean_text(title),
+                    'content': self.clean_text(content),
+                    'url': link,
+                    'published': pub_date
+                })
+        
+        return articles
     
+    def _site_parser(self, url: str):
+        """Специализированный парсер для сайта по его hostname (одна проверка по словарю) или None."""
+        method_name = self.SITE_PARSERS.get(urlparse(url).hostname)
+        return getattr(self, method_name) if method_name else None
+
     def scrape_website(self, url: str) -> List[Dict]:
         """
         Основной метод для парсинга веб-сайтов.
         Использует специализированные парсеры для известных сайтов и Mistral AI для остальных.
         """
         try:
-            hostname = urlparse(url).hostname
+            site_parser = self._site_parser(url)
             
-            if hostname == 'shoppers.media':
-                # Для shoppers.media делаем запрос через requests и используем кастомный парсер
-                response = self.session.get(url, timeout=30)
+            if site_parser:
+                # Для известных сайтов делаем условный запрос через requests и используем кастомный парсер
+                response, body = self._get_limited(url, headers=self._conditional_headers(url))
+                if response.status_code == 304:
+                    logger.info(f"Страница {url} не изменилась с прошлой проверки.")
+                    return []
                 response.raise_for_status()
-                soup = BeautifulSoup(response.content, 'html.parser')
-                return self._parse_shoppers_media(soup, url)
+                articles = site_parser(LexborHTMLParser(body), url)
+                self._store_validators(url, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+                return articles
             else:
-                # Для всех остальных сайтов используем Selenium + Mistral
+                # Для всех остальных сайтов - Mistral (Selenium только если контент рисуется JavaScript)
                 return self.scrape_website_with_mistral(url)
                 
         except requests.RequestException as e:
@@ -230,26 +494,38 @@ class NewsScraper:
             return []
     
     def scrape_telegram_channel(self, channel_url: str) -> List[Dict]:
-        """Парсинг Telegram-канала с использованием Telethon клиента."""
+        """Парсинг Telegram-канала с использованием Telethon клиента (синхронная обертка)."""
+        # Запускаем асинхронную функцию в синхронном контексте
+        return asyncio.run(self.scrape_telegram_channel_async(channel_url))
+
+    async def scrape_telegram_channel_async(self, channel_url: str) -> List[Dict]:
+        """Парсинг Telegram-канала внутри уже работающего event loop."""
         if not self.telegram_client:
             logger.warning(f"Парсинг Telegram-каналов отключен, так как не заданы TELEGRAM_API_ID и TELEGRAM_API_HASH. Пропуск источника: {channel_url}")
             return []
             
         logger.info(f"Парсинг Telegram-канала: {channel_url}")
         try:
-            # Запускаем асинхронную функцию в синхронном контексте
-            messages = asyncio.run(self.telegram_client.get_channel_messages(channel_url))
+            # Клиент Telethon подключается и отключается на каждый запрос (async with),
+            # поэтому параллельные запросы к каналам выполняем по очереди
+            async with self._get_telegram_lock():
+                messages = await self.telegram_client.get_channel_messages(channel_url)
             
             # Фильтруем по ключевым словам
-            relevant_articles = [
-                msg for msg in messages 
-                if self.is_marketplace_related(msg['content'])
-            ]
-            return relevant_articles
+            relevant = self.marketplace_related_mask([msg['content'] for msg in messages])
+            return [msg for msg, is_relevant in zip(messages, relevant) if is_relevant]
             
         except Exception as e:
             logger.error(f"Ошибка при парсинге Telegram-канала {channel_url}: {e}")
             return []
+
+    def _get_telegram_lock(self) -> asyncio.Lock:
+        """Блокировка запросов к Telegram для текущего event loop (asyncio.Lock нельзя делить между loop)."""
+        loop = asyncio.get_running_loop()
+        if self._telegram_lock is None or self._telegram_lock_loop is not loop:
+            self._telegram_lock = asyncio.Lock()
+            self._telegram_lock_loop = loop
+        return self._telegram_lock
             
     def scrape_source(self, source_type: str, url: str) -> List[Dict]:
         """Парсинг источника в зависимости от его типа"""
@@ -263,90 +539,6 @@ class NewsScraper:
             logger.warning(f"Неизвестный тип источника: {source_type}")
             return []
     
-    async def scrape_multiple_sources(self, sources: List[Dict]) -> List[Dict]:
-        """Асинхронный парсинг нескольких источников"""
-        async with aiohttp.ClientSession() as session:
-            tasks = []
-            for source in sources:
-                task = self.scrape_source_async(session, source)
-                tasks.append(task)
-            
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            all_articles = []
-            for result in results:
-                if isinstance(result, list):
-                    all_articles.extend(result)
-                elif isinstance(result, Exception):
-                    logger.error(f"Ошибка при парсинге: {result}")
-            
-            return all_articles
-    
-    async def scrape_source_async(self, session: aiohttp.ClientSession, source: Dict) -> List[Dict]:
-        """Асинхронный парсинг одного источника"""
-        try:
-            source_type = source['source_type']
-            url = source['url']
-            
-            if source_type == 'rss':
-                return self.scrape_rss_feed(url)
-            elif source_type == 'website':
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        html = await response.text()
-                        return self.scrape_website_content(html, url)
-            elif source_type == 'telegram':
-                return self.scrape_telegram_channel(url)
-            
-            return []
-            
-        except Exception as e:
-            logger.error(f"Ошибка при асинхронном парсинге {source.get('url', 'unknown')}: {e}")
-            return []
-    
-    def scrape_website_content(self, html: str, base_url: str) -> List[Dict]:
-        """Парсинг контента веб-сайта из HTML"""
-        soup = BeautifulSoup(html, 'html.parser')
-        articles = []
-        
-        # Ищем статьи по различным селекторам
-        article_selectors = [
-            'article',
-            '.article',
-            '.news-item',
-            '.post',
-            '.entry',
-            '[class*="article"]',
-            '[class*="news"]',
-            '[class*="post"]'
-        ]
-        
-        for selector in article_selectors:
-            elements = soup.select(selector)
-            for element in elements:
-                # Извлекаем заголовок
-                title_elem = element.find(['h1', 'h2', 'h3', '.title', '.headline'])
-                title = title_elem.get_text().strip() if title_elem else ""
-                
-                # Извлекаем контент
-                content_elem = element.find(['p', '.content', '.text', '.description'])
-                content = content_elem.get_text().strip() if content_elem else ""
-                
-                # Извлекаем ссылку
-                link_elem = element.find('a', href=True)
-                link = urljoin(base_url, link_elem['href']) if link_elem else base_url
-                
-                # Проверяем релевантность
-                if title and self.is_marketplace_related(title + ' ' + content):
-                    articles.append({
-                        'title': self.clean_text(title),
-                        'content': self.clean_text(content),
-                        'url': link,
-                        'published': None
-                    })
-        
-        return articles
-
     def __del__(self):
         """Вызывает close() при уничтожении объекта для обратной совместимости."""
         self.close()
@@ -1,11 +1,17 @@
+import asyncio
+import hashlib
 import logging
-from typing import Optional
+import threading
+import time
+from typing import List, Optional, Tuple
+import aiohttp
+import numpy as np
 import openai
-import requests
 import os
-import uuid
+from pathlib import Path
 
 from config import OPENAI_API_KEY, IMAGE_SIZE, IMAGE_QUALITY
+from database import Database
 
 logger = logging.getLogger(__name__)
 
@@ -13,35 +19,216 @@ class OpenAIClient:
     """
     Клиент для работы с API OpenAI, используется ИСКЛЮЧИТЕЛЬНО для генерации изображений.
     """
-    def __init__(self):
+    EMBEDDING_MODEL = "text-embedding-3-small"
+    # Косинусная близость промптов, начиная с которой готовое изображение переиспользуется
+    SIMILARITY_THRESHOLD = 0.92
+    # Соединения для скачивания картинок
+    DOWNLOAD_CONNECTIONS = 16
+    # Повторы скачивания при обрыве соединения или временной ошибке CDN
+    DOWNLOAD_RETRIES = 3
+    DOWNLOAD_RETRY_BACKOFF = 0.3
+    DOWNLOAD_RETRY_STATUSES = (429, 500, 502, 503, 504)
+    # Файл моложе этого возраста (сек) не удаляется: ссылка на него могла еще не дойти до БД
+    UNUSED_IMAGE_MIN_AGE = 3600
+
+    def __init__(self, db: Database, images_dir: str = "images"):
         # API ключ теперь подхватывается автоматически из переменных окружения
         # библиотекой openai. Оставляем проверку для надежности.
         if not OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY не установлен в переменных окружения")
 
-        self.client = openai.OpenAI()
         self.dalle_model = "dall-e-3"
         
         # Создаем папку для изображений, если ее нет
-        self.images_dir = "images"
+        self.images_dir = images_dir
         os.makedirs(self.images_dir, exist_ok=True)
 
+        # Кэш изображений хранится в БД; матрица эмбеддингов загружается в память при первом промахе
+        self.db = db
+        self._embeddings: Optional[np.ndarray] = None
+        self._embedding_paths: List[str] = []
+        self._cache_lock = threading.Lock()
+        # Клиент OpenAI и HTTP-сессия для скачивания создаются лениво и привязаны к event loop, в котором созданы
+        self._client: Optional[openai.AsyncOpenAI] = None
+        self._http: Optional[aiohttp.ClientSession] = None
+        self._clients_loop: Optional[asyncio.AbstractEventLoop] = None
+
     def generate_image_prompt(self, title: str, content: str) -> str:
-        """Создает промпт для DALL-E на основе заголовка и контента."""
+        """Создает промпт для DALL-E на основе заголовка и контента (неизменный стиль - в начале)."""
         prompt = (
+            "Style: photorealistic, high detail, professional illustration for a news article. "
             f"News article illustration: '{title}'. "
-            f"Content summary: {content[:500]}. "
-            "Style: photorealistic, high detail, professional illustration for a news article."
+            f"Content summary: {content[:500]}."
         )
         return prompt
 
-    def generate_image(self, title: str, content: str) -> Optional[str]:
-        """Сгенерировать изображение, скачать его и вернуть локальный путь."""
+    async def _embed(self, client: openai.AsyncOpenAI, text: str) -> Optional[np.ndarray]:
+        """Нормированный эмбеддинг текста или None, если API эмбеддингов недоступен."""
+        try:
+            response = await client.embeddings.create(model=self.EMBEDDING_MODEL, input=text)
+        except Exception as e:
+            logger.warning("Не удалось получить эмбеддинг промпта, поиск похожих изображений пропущен: %s", e)
+            return None
+        vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def _load_embeddings(self):
+        """Загружает эмбеддинги закэшированных изображений из БД (вызывать под _cache_lock)."""
+        if self._embeddings is not None:
+            return
+        rows = self.db.get_image_embeddings()
+        self._embedding_paths = [path for _, path in rows]
+        if rows:
+            self._embeddings = np.vstack([np.frombuffer(embedding, dtype=np.float32) for embedding, _ in rows])
+        else:
+            self._embeddings = np.empty((0, 0), dtype=np.float32)
+
+    def _find_similar_image(self, embedding: np.ndarray) -> Optional[str]:
+        """Путь к существующему изображению с достаточно похожим промптом."""
+        with self._cache_lock:
+            self._load_embeddings()
+            if not self._embedding_paths or self._embeddings.shape[1] != embedding.shape[0]:
+                return None
+            # Векторы нормированы, поэтому скалярное произведение - это косинусная близость
+            similarities = self._embeddings @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.SIMILARITY_THRESHOLD:
+                return None
+            path = self._embedding_paths[best]
+        return path if os.path.exists(path) else None
+
+    def _remember_image(self, prompt_hash: str, embedding: Optional[np.ndarray], path: str):
+        """Сохраняет изображение в кэш БД и в матрицу эмбеддингов в памяти."""
+        self.db.add_cached_image(prompt_hash, embedding.tobytes() if embedding is not None else None, path)
+        if embedding is None:
+            return
+        with self._cache_lock:
+            if self._embeddings is None:
+                return  # Матрица еще не загружалась: новая строка подтянется из БД вместе с остальными
+            if self._embedding_paths and self._embeddings.shape[1] == embedding.shape[0]:
+                self._embeddings = np.vstack([self._embeddings, embedding])
+            else:
+                self._embeddings = embedding.reshape(1, -1)
+                self._embedding_paths = []
+            self._embedding_paths.append(path)
+
+    def _save_image(self, image_bytes: bytes) -> str:
+        """
+        Сохраняет картинку под именем по SHA-256 содержимого (images/ab/abcd....png) и возвращает путь.
+        Одинаковые файлы не дублируются; подкаталоги по первым двум символам ограничивают размер каталога.
+        """
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        shard_dir = os.path.join(self.images_dir, digest[:2])
+        file_path = os.path.join(shard_dir, f"{digest}.png")
+        if not os.path.exists(file_path):
+            os.makedirs(shard_dir, exist_ok=True)
+            # Запись через временный файл: параллельная генерация той же картинки не увидит недописанный файл
+            tmp_path = f"{file_path}.{threading.get_ident()}.tmp"
+            Path(tmp_path).write_bytes(image_bytes)
+            os.replace(tmp_path, file_path)
+        return file_path
+
+    def delete_unused_images(self) -> int:
+        """
+        Удаляет из images_dir файлы, на которые не ссылается ни одна статья и ни одна запись кэша.
+        Одинаковые картинки хранятся одним файлом (имя - SHA-256 содержимого), поэтому файл удаляется
+        только когда он не нужен никому. Возвращает количество удаленных файлов.
+        """
+        referenced = {os.path.normpath(path) for path in self.db.referenced_image_paths()}
+        threshold = time.time() - self.UNUSED_IMAGE_MIN_AGE
+        removed = 0
+        for root, _, files in os.walk(self.images_dir):
+            for name in files:
+                path = os.path.normpath(os.path.join(root, name))
+                if path in referenced:
+                    continue
+                try:
+                    if os.path.getmtime(path) < threshold:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        # Записи кэша могли быть удалены вместе со старыми статьями: матрица эмбеддингов перечитается из БД
+        with self._cache_lock:
+            self._embeddings = None
+            self._embedding_paths = []
+        if removed:
+            logger.info("Удалено неиспользуемых изображений: %s", removed)
+        return removed
+
+    def _async_clients(self) -> Tuple[openai.AsyncOpenAI, aiohttp.ClientSession]:
+        """
+        Общие клиент OpenAI и HTTP-сессия текущего event loop, создаются при первом вызове.
+        Соединения с API и CDN переиспользуются от картинки к картинке, пока жив event loop бота.
+        """
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._http.closed or self._clients_loop is not loop:
+            # Клиентов другого event loop отсюда закрыть нельзя; их соединения закрываются вместе с тем loop
+            connector = aiohttp.TCPConnector(limit=self.DOWNLOAD_CONNECTIONS)
+            self._client = openai.AsyncOpenAI()
+            self._http = aiohttp.ClientSession(connector=connector)
+            self._clients_loop = loop
+        return self._client, self._http
+
+    async def aclose(self):
+        """Закрывает общие клиент OpenAI и HTTP-сессию изнутри их event loop (при остановке бота)."""
+        client, http = self._client, self._http
+        self._client = self._http = self._clients_loop = None
+        if http is not None and not http.closed:
+            await http.close()
+        if client is not None:
+            await client.close()
+
+    async def generate_image(self, title: str, content: str, use_cache: bool = True) -> Optional[str]:
+        """
+        Сгенерировать изображение, скачать его и вернуть локальный путь.
+        Для уже встречавшегося или близкого по смыслу промпта возвращается ранее сохраненное изображение,
+        если не передан use_cache=False (явный запрос нового изображения).
+        """
+        client, http = self._async_clients()
+        return await self._generate_image(client, http, title, content, use_cache)
+
+    async def _download_image(self, http: aiohttp.ClientSession, url: str) -> bytes:
+        """Скачивает картинку с повторами и экспоненциальной паузой при временных ошибках."""
+        for attempt in range(self.DOWNLOAD_RETRIES + 1):
+            try:
+                async with http.get(url) as response:
+                    if response.status in self.DOWNLOAD_RETRY_STATUSES and attempt < self.DOWNLOAD_RETRIES:
+                        raise aiohttp.ClientResponseError(response.request_info, response.history, status=response.status)
+                    response.raise_for_status()
+                    return await response.read()
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, aiohttp.ClientResponseError) as e:
+                if attempt == self.DOWNLOAD_RETRIES or (
+                        isinstance(e, aiohttp.ClientResponseError) and e.status not in self.DOWNLOAD_RETRY_STATUSES):
+                    raise
+                await asyncio.sleep(self.DOWNLOAD_RETRY_BACKOFF * 2 ** attempt)
+
+    async def _generate_image(self, client: openai.AsyncOpenAI, http: aiohttp.ClientSession,
+                              title: str, content: str, use_cache: bool) -> Optional[str]:
+        """Генерация одного изображения с общими клиентом OpenAI и HTTP-сессией."""
         try:
             image_prompt = self.generate_image_prompt(title, content)
-            logger.info(f"Генерация изображения с промптом: {image_prompt}")
+            prompt_hash = hashlib.sha256(image_prompt.encode()).hexdigest()
+            embedding = None
 
-            response = self.client.images.generate(
+            if use_cache:
+                # Точное совпадение промпта
+                cached_path = await asyncio.to_thread(self.db.get_cached_image, prompt_hash)
+                if cached_path and os.path.exists(cached_path):
+                    logger.info("Изображение для этого промпта уже есть: %s", cached_path)
+                    return cached_path
+
+                # Близкий по смыслу промпт
+                embedding = await self._embed(client, image_prompt)
+                if embedding is not None:
+                    similar_path = await asyncio.to_thread(self._find_similar_image, embedding)
+                    if similar_path:
+                        logger.info("Найдено изображение для похожего промпта: %s", similar_path)
+                        return similar_path
+
+            logger.info("Генерация изображения с промптом: %s", image_prompt)
+
+            response = await client.images.generate(
                 model=self.dalle_model,
                 prompt=image_prompt,
                 size=IMAGE_SIZE,
@@ -51,19 +238,13 @@ class OpenAIClient:
 
             image_url = response.data[0].url
             
-            # Скачиваем изображение
-            image_response = requests.get(image_url, stream=True)
-            image_response.raise_for_status()
-            
-            # Генерируем уникальное имя файла
-            file_name = f"{uuid.uuid4()}.png"
-            file_path = os.path.join(self.images_dir, file_name)
-            
-            with open(file_path, 'wb') as f:
-                for chunk in image_response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+            # Картинка (единицы МБ) читается целиком и пишется на диск одним вызовом в потоке,
+            # без цикла по кускам и без блокирующей записи в event loop
+            image_bytes = await self._download_image(http, image_url)
+            file_path = await asyncio.to_thread(self._save_image, image_bytes)
             
-            logger.info(f"Изображение успешно скачано и сохранено по пути: {file_path}")
+            logger.info("Изображение успешно скачано и сохранено по пути: %s", file_path)
+            await asyncio.to_thread(self._remember_image, prompt_hash, embedding, file_path)
             return file_path
 
         except Exception as e:
@@ -1,11 +1,9 @@
-import schedule
-import time
-import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import List, Dict
-import threading
-from urllib.parse import urlparse, urlunparse
+
+from apscheduler.schedulers.background import BackgroundScheduler
 
 from database import Database
 from news_scraper import NewsScraper
@@ -16,45 +14,18 @@ from config import CHECK_INTERVAL
 logger = logging.getLogger(__name__)
 
 class NewsScheduler:
+    # Сколько RSS-лент скачивается и разбирается одновременно
+    SCRAPE_WORKERS = 16
+
     def __init__(self, db: Database, scraper: NewsScraper, mistral: MistralClient, openai: OpenAIClient):
         self.db = db
         self.scraper = scraper
         self.mistral = mistral
         self.openai = openai
-        self.scheduler = schedule.Scheduler()
+        # coalesce: пропущенные запуски (например, пока шла долгая проверка) выполняются один раз, а не пачкой
+        self.scheduler = BackgroundScheduler(job_defaults={'coalesce': True, 'max_instances': 1})
         self.is_running = False
-        self.thread = None
     
-    def normalize_url(self, url: str) -> str:
-        """
-        Агрессивно нормализует URL для максимальной унификации:
-        - Убирает схему (http/https)
-        - Убирает 'www.'
-        - Убирает параметры и фрагменты
-        - Убирает конечный слэш
-        """
-        if not url:
-            return ""
-        try:
-            # Сначала убираем схему для лучшей унификации
-            if url.startswith(('http://', 'https://')):
-                url = url.split('://', 1)[1]
-            
-            # Убираем www.
-            if url.startswith('www.'):
-                url = url.split('www.', 1)[1]
-
-            # Используем urlparse для остального
-            parsed = urlparse('http://' + url) # Добавляем временную схему для парсинга
-            path = parsed.path.rstrip('/')
-            
-            # Собираем без схемы
-            normalized = f"{parsed.netloc}{path}".lower()
-            return normalized
-        except Exception as e:
-            logger.warning(f"Не удалось нормализовать URL '{url}': {e}")
-            return url.lower()
-
     def check_sources_for_news(self) -> Dict:
         """
         Проверяет все активные источники на наличие новых статей,
@@ -65,41 +36,47 @@ class NewsScheduler:
             
             sources = self.db.get_news_sources(active_only=True)
             total_new_articles = 0
-            articles_by_source = {source['name']: 0 for source in sources}
+            articles_by_source = {source.name: 0 for source in sources}
+            scraped = self._scrape_sources(sources)
             
             for source in sources:
-                source_name = source['name']
+                source_name = source.name
                 try:
-                    logger.info(f"Проверяю источник: {source_name}")
-                    
-                    articles = self.scraper.scrape_source(source['source_type'], source['url'])
+                    articles = scraped.get(source.id, [])
                     
+                    # Одна и та же статья может встретиться несколько раз (в т.ч. под разными написаниями ссылки):
+                    # оставляем первую для каждого нормализованного URL еще до обращения к БД
+                    unique_articles = {}
                     for article in articles:
-                        normalized_url = self.normalize_url(article['url'])
-                        if not normalized_url:
-                            continue
-
-                        if self.db.article_exists(normalized_url):
-                            continue
-                        
-                        article_id = self.db.add_news_article(
-                            source['id'],
-                            article['title'],
-                            article['content'],
-                            normalized_url
-                        )
-                        
-                        if article_id:
-                            articles_by_source[source_name] += 1
-                            total_new_articles += 1
-                            logger.info(f"Добавлена новая статья: {article['title'][:50]}...")
+                        if article['url']:
+                            unique_articles.setdefault(self.db.normalize_url(article['url']), article)
+                    
+                    # Проверяем существование всех URL источника одним запросом; нормализует их сама БД
+                    existing_urls = self.db.existing_urls([article['url'] for article in unique_articles.values()])
+                    
+                    new_rows = [
+                        (source.id, article['title'], article['content'], article['url'])
+                        for article in unique_articles.values()
+                        if article['url'] not in existing_urls
+                    ]
+                    
+                    # Все новые статьи источника - одной транзакцией
+                    added = self.db.add_news_articles_bulk(new_rows)
+                    # Теперь в БД есть все ссылки источника (уже были, добавлены или совпали с добавленной
+                    # после нормализации): парсер в следующих циклах отбросит их сразу
+                    self.scraper.remember_urls(article['url'] for article in articles if article['url'])
+                    if added:
+                        articles_by_source[source_name] += added
+                        total_new_articles += added
+                        logger.info("Добавлено новых статей из источника %s: %s", source_name, added)
                     
-                    self.db.update_source_last_check(source['id'])
+                    self.db.update_source_last_check(source.id)
                     
                 except Exception as e:
                     logger.error(f"Ошибка при проверке источника {source_name}: {e}")
             
-            logger.info(f"Проверка завершена. Найдено новых статей: {total_new_articles}")
+            self.db.flush_last_check()
+            logger.info("Проверка завершена. Найдено новых статей: %s", total_new_articles)
             
             return {
                 'total': total_new_articles,
@@ -114,53 +91,41 @@ class NewsScheduler:
         """Задача для очистки старых новостей из БД."""
         logger.info("Запускаю ежедневную задачу очистки старых новостей...")
         self.db.delete_old_articles(days_old=7)
+        # Файлы изображений удаляются здесь, а не после отправки: один файл может принадлежать нескольким статьям
+        self.openai.delete_unused_images()
+        # После массового удаления статистика планировщика могла устареть
+        self.db.optimize()
 
-    def process_pending_articles(self):
-        """Обработать статьи в статусе 'pending'"""
-        try:
-            logger.info("Обрабатываю статьи в ожидании...")
-            
-            articles = self.db.get_pending_articles()
-            
-            for article in articles:
-                try:
-                    # Проверяем, не обработана ли уже статья
-                    if article['rewritten_title']:
-                        continue
-                    
-                    logger.info(f"Обрабатываю статью: {article['original_title'][:50]}...")
-                    
-                    # Переписываем статью
-                    rewritten = self.mistral.rewrite_news_article(
-                        article['original_title'], 
-                        article['original_content']
-                    )
-                    
-                    # Генерируем изображение
-                    image_url = self.openai.generate_image(
-                        rewritten['title'],
-                        rewritten['content']
-                    )
-                    
-                    # Сохраняем в базу
-                    self.db.update_article_rewrite(
-                        article['id'], 
-                        rewritten['title'], 
-                        rewritten['content'],
-                        rewritten['hashtags']
-                    )
-                    
-                    if image_url:
-                        self.db.update_article_image(article['id'], image_url, "")
+    def _scrape_sources(self, sources: List) -> Dict[int, List[Dict]]:
+        """
+        Парсит все источники и возвращает {id источника: статьи}.
+        RSS-ленты независимы и качаются параллельно в пуле потоков; тем временем в этом потоке
+        разбираются сайты (Selenium один и не потокобезопасен) и Telegram (общий клиент Telethon).
+        """
+        results = {}
+        rss_sources = [source for source in sources if source.source_type == 'rss']
+        with ThreadPoolExecutor(max_workers=max(1, min(self.SCRAPE_WORKERS, len(rss_sources)))) as pool:
+            futures = {pool.submit(self.scraper.scrape_rss_feed, source.url): source for source in rss_sources}
 
-                    logger.info(f"Статья обработана: {rewritten['title'][:50]}...")
-                    
+            # Сайты парсятся одним пакетом: запросы к Mistral по их страницам идут параллельно
+            website_articles = self.scraper.scrape_websites(
+                [source.url for source in sources if source.source_type == 'website']
+            )
+            for source in sources:
+                if source.source_type == 'website':
+                    results[source.id] = website_articles.get(source.url, [])
+                elif source.source_type != 'rss':
+                    logger.info("Проверяю источник: %s", source.name)
+                    results[source.id] = self.scraper.scrape_source(source.source_type, source.url)
+
+            for future, source in futures.items():
+                try:
+                    results[source.id] = future.result()
                 except Exception as e:
-                    logger.error(f"Ошибка при обработке статьи {article['id']}: {e}")
-            
-        except Exception as e:
-            logger.error(f"Ошибка при обработке статей: {e}")
-    
+                    logger.error(f"Ошибка при парсинге источника {source.name}: {e}")
+                    results[source.id] = []
+        return results
+
     def cleanup_old_articles(self):
         """Очистка старых статей"""
         try:
@@ -180,9 +145,6 @@ class NewsScheduler:
             # Проверяем источники на новые новости
             self.check_sources_for_news()
             
-            # Обрабатываем статьи в ожидании
-            # self.process_pending_articles() # Отключено, т.к. обработка идет при просмотре
-            
             # Очищаем старые статьи
             self.cleanup_old_articles()
             
@@ -195,16 +157,21 @@ class NewsScheduler:
             logger.warning("Планировщик уже запущен")
             return
         
-        logger.info(f"Запускаю планировщик с интервалом {CHECK_INTERVAL} минут")
+        logger.info("Запускаю планировщик с интервалом %s минут", CHECK_INTERVAL)
         
-        # Настраиваем расписание
-        schedule.every(CHECK_INTERVAL).minutes.do(self.check_sources_for_news)
-        schedule.every().day.at("03:00").do(self.cleanup_old_news_job)
+        # Настраиваем расписание: задачи запускаются точно в срок, без ежеминутного опроса
+        self.scheduler.add_job(
+            self.check_sources_for_news, 'interval', minutes=CHECK_INTERVAL,
+            id='check_sources', replace_existing=True
+        )
+        self.scheduler.add_job(
+            self.cleanup_old_news_job, 'cron', hour=3, minute=0,
+            id='cleanup_old_news', replace_existing=True
+        )
         
-        # Запускаем планировщик в отдельном потоке
+        # Задачи выполняются в рабочем потоке APScheduler
+        self.scheduler.start()
         self.is_running = True
-        self.thread = threading.Thread(target=self._run_scheduler_loop, daemon=True)
-        self.thread.start()
         
         logger.info("Планировщик запущен")
     
@@ -217,30 +184,20 @@ class NewsScheduler:
         logger.info("Останавливаю планировщик...")
         
         self.is_running = False
-        schedule.clear()
-        
-        if self.thread and self.thread.is_alive():
-            self.thread.join(timeout=5)
+        # Не ждем завершения текущей задачи: проверка источников может идти минутами
+        self.scheduler.shutdown(wait=False)
         
         logger.info("Планировщик остановлен")
     
-    def _run_scheduler_loop(self):
-        """Основной цикл планировщика"""
-        while self.is_running:
-            try:
-                schedule.run_pending()
-                time.sleep(60)  # Проверяем каждую минуту
-            except Exception as e:
-                logger.error(f"Ошибка в цикле планировщика: {e}")
-                time.sleep(60)
-    
     def get_scheduler_status(self) -> Dict:
         """Получить статус планировщика"""
+        jobs = self.scheduler.get_jobs()
+        next_runs = [job.next_run_time for job in jobs if job.next_run_time]
         return {
             'is_running': self.is_running,
             'check_interval': CHECK_INTERVAL,
-            'next_run': schedule.next_run() if schedule.jobs else None,
-            'jobs_count': len(schedule.jobs)
+            'next_run': min(next_runs) if next_runs else None,
+            'jobs_count': len(jobs)
         }
     
     def force_check_sources(self) -> Dict:
@@ -248,8 +205,3 @@ class NewsScheduler:
         logger.info("Запускаю принудительную проверку источников...")
         results = self.check_sources_for_news()
         return results
-    
-    def force_process_articles(self):
-        """Принудительная обработка статей"""
-        logger.info("Запускаю принудительную обработку статей...")
-        self.process_pending_articles()
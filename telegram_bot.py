@@ -1,19 +1,19 @@
 import logging
 import asyncio
-from typing import Dict, List
+import html
+from typing import Dict, List, Optional, Union
 from functools import wraps
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes, MessageHandler, filters, ConversationHandler
+from telegram.ext import AIORateLimiter, Application, CommandHandler, CallbackQueryHandler, ContextTypes, MessageHandler, filters, ConversationHandler
 from telegram.constants import ParseMode
 from telegram.error import BadRequest
 import requests
-import os
+from pathlib import Path
 from datetime import datetime
-import json
-from urllib.parse import urlparse, urlunparse
+import orjson
 
 from config import TELEGRAM_BOT_TOKEN, ADMIN_USER_ID, TARGET_CHANNEL_ID
-from database import Database
+from database import Database, AsyncDatabase
 from scheduler import NewsScheduler
 from mistral_client import MistralClient
 from openai_client import OpenAIClient
@@ -43,14 +43,113 @@ KEYWORD_MANAGE, KEYWORD_ADD, KEYWORD_DELETE = range(3, 6)
 # Определяем состояния для диалога редактирования источника
 EDIT_SOURCE_NAME, EDIT_SOURCE_URL = range(6, 8)
 
+# Клавиатуры меню не меняются (объекты PTB неизменяемы), поэтому создаются один раз
+MAIN_MENU_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📰 Просмотреть новости", callback_data="view_news")],
+    [InlineKeyboardButton("⚙️ Управление источниками", callback_data="manage_sources")],
+    [InlineKeyboardButton("🔑 Управление словами", callback_data="manage_keywords")],
+    [InlineKeyboardButton("🔄 Проверить источники", callback_data="check_sources")],
+    [InlineKeyboardButton("📊 Статистика", callback_data="statistics")],
+    [InlineKeyboardButton("🗑️ Очистить базу данных", callback_data="clear_database")]
+])
+BACK_TO_MENU_MARKUP = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад в меню", callback_data="main_menu")]])
+
+
+# Текст статьи для Telegram (parse_mode=HTML) без ссылки на источник: ссылка дописывается в конец
+# (см. article_caption). Все подставляемые значения экранируются; tags - хэштеги с отступом или пустая строка
+ARTICLE_CAPTION_HEAD = "<b>{title}</b>\n\n{content}\n\n{tags}🔗 Источник: "
+
+
+def article_caption_head(title: str, content: str, hashtags: List[str]) -> str:
+    """Начало текста статьи по ARTICLE_CAPTION_HEAD: заголовок, текст и хэштеги, экранированные для HTML."""
+    return ARTICLE_CAPTION_HEAD.format(
+        title=html.escape(title, quote=False),
+        content=html.escape(content, quote=False),
+        tags=html.escape(" ".join(hashtags), quote=False) + "\n\n" if hashtags else ""
+    )
+
+
+def article_caption(title: str, content: str, hashtags: List[str], url: str) -> str:
+    """Готовый текст статьи для отправки в Telegram с parse_mode=HTML (подпись к фото или сообщение)."""
+    return article_caption_head(title, content, hashtags) + html.escape(url, quote=False)
+
 
 class NewsBot:
+    # Префиксы callback_data, обработка которых идет фоновой задачей
+    BACKGROUND_CALLBACKS = ("check_sources", "publish_")
+    # Общий лимит Telegram - около 30 сообщений в секунду; держимся с запасом
+    SEND_RATE_PER_SECOND = 25
+    SEND_MAX_RETRIES = 3
+
     def __init__(self, db: Database, scheduler: NewsScheduler, mistral: MistralClient, openai: OpenAIClient):
-        self.db = db
+        # Вызовы БД выполняются в потоках, чтобы не блокировать цикл событий бота
+        self.db = AsyncDatabase(db)
         self.scheduler = scheduler
         self.mistral = mistral
         self.openai = openai
         self.current_articles = {}  # Хранит текущие статьи для каждого пользователя
+        # Кэш статей и списка 'pending' действителен, пока не изменилась db.articles_version
+        self._articles_version = db.articles_version
+        self._article_cache: Dict[int, Dict] = {}
+        self._pending_cache: Optional[List[Dict]] = None
+
+        # Маршруты button_callback: обработчик вызывается как handler(update, context, query, data).
+        # Точные значения callback_data ищутся в словаре, остальные - по префиксу (порядок важен)
+        self._exact_handlers = {
+            "view_news": lambda update, context, query, data: self.show_pending_news(query, context),
+            "manage_sources": lambda update, context, query, data: self.manage_sources(query),
+            "check_sources": lambda update, context, query, data: self.check_sources(query, context),
+            "manage_keywords": lambda update, context, query, data: self.manage_keywords_menu(update, context),
+            "statistics": lambda update, context, query, data: self.show_statistics(query),
+            "main_menu": lambda update, context, query, data: self.show_main_menu(query, context),
+            "clear_database": lambda update, context, query, data: self.show_clear_database_confirmation(query, context),
+            "confirm_clear_database": lambda update, context, query, data: self.clear_database(query, context),
+            "cancel_clear_database": lambda update, context, query, data: self.show_main_menu(query, context),
+            "add_source": lambda update, context, query, data: self.show_add_source_form(update, context),
+        }
+        self._prefix_handlers = (
+            ("article_", lambda update, context, query, data: self.show_article_details(query, data, context)),
+            ("rewrite_", lambda update, context, query, data: self.rewrite_article(query, data, context)),
+            ("new_image_", lambda update, context, query, data: self.generate_new_image(query, data, context)),
+            ("publish_", lambda update, context, query, data: self.publish_article(query, data, context)),
+            ("reject_", lambda update, context, query, data: self.reject_article(query, data, context)),
+            ("view_news_page_", lambda update, context, query, data: self.show_news_page(query, data, context)),
+            ("delete_article_", lambda update, context, query, data: self.delete_article_callback(query, context, data)),
+            ("view_source_", lambda update, context, query, data: self.view_source_details(query, data)),
+            ("delete_source_", lambda update, context, query, data: self.delete_source(query, data)),
+            ("edit_source_", lambda update, context, query, data: self.start_edit_source(query, context)),
+        )
+
+    def _sync_article_cache(self):
+        """Сбрасывает кэш статей, если с момента заполнения таблица news_articles менялась."""
+        version = self.db.articles_version
+        if version != self._articles_version:
+            self._article_cache.clear()
+            self._pending_cache = None
+            self._articles_version = version
+
+    async def _get_article(self, article_id: int) -> Optional[Dict]:
+        """Статья по ID: из кэша, пока статьи не менялись, иначе из БД."""
+        self._sync_article_cache()
+        version = self._articles_version
+        article = self._article_cache.get(article_id)
+        if article is None:
+            article = await self.db.get_article_by_id(article_id)
+            # Пока шел запрос, статьи могли измениться: такой результат не кэшируем
+            if article is not None and self.db.articles_version == version:
+                self._article_cache[article_id] = article
+        return article
+
+    async def _get_pending_articles(self) -> List[Dict]:
+        """Статьи 'pending': из кэша, пока статьи не менялись, иначе из БД."""
+        self._sync_article_cache()
+        version = self._articles_version
+        if self._pending_cache is None:
+            articles = await self.db.get_pending_articles()
+            if self.db.articles_version != version:
+                return articles
+            self._pending_cache = articles
+        return self._pending_cache
         
     @admin_only
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -65,59 +164,33 @@ class NewsBot:
     async def button_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик нажатий на кнопки"""
         query = update.callback_query
+        # Отвечаем на callback сразу, до любой работы: клиент перестает показывать загрузку
         await query.answer()
         
         data = query.data
-        
-        if data == "view_news":
-            await self.show_pending_news(query, context)
-        elif data == "manage_sources":
-            await self.manage_sources(query)
-        elif data == "check_sources":
-            await self.check_sources(query, context)
-        elif data == "manage_keywords":
-            await self.manage_keywords_menu(update, context)
-        elif data == "statistics":
-            await self.show_statistics(query)
-        elif data.startswith("article_"):
-            await self.show_article_details(query, data, context)
-        elif data.startswith("rewrite_"):
-            await self.rewrite_article(query, data, context)
-        elif data.startswith("new_image_"):
-            await self.generate_new_image(query, data, context)
-        elif data.startswith("publish_"):
-            await self.publish_article(query, data, context)
-        elif data.startswith("reject_"):
-            await self.reject_article(query, data, context)
-        elif data == "main_menu":
-            await self.show_main_menu(query, context)
-        elif data.startswith('view_news_page_'):
-            try:
-                page = int(data.replace('view_news_page_', ''))
-                # Добавим защиту, чтобы страница не могла быть меньше 1
-                if page < 1:
-                    page = 1
-                await self.show_pending_news(query, context, page=page)
-            except (ValueError, TypeError):
-                await query.answer("❌ Ошибка: неверный номер страницы.")
-        elif data.startswith('delete_article_'):
-            await self.delete_article_callback(query, context, data)
-        elif data == "clear_database":
-            await self.show_clear_database_confirmation(query, context)
-        elif data == "confirm_clear_database":
-            await self.clear_database(query, context)
-        elif data == "cancel_clear_database":
-            await self.show_main_menu(query, context)
-        elif data == "add_source":
-            await self.show_add_source_form(update, context)
-        elif data.startswith("view_source_"):
-            await self.view_source_details(query, data)
-        elif data.startswith("delete_source_"):
-            await self.delete_source(query, data)
-        elif data.startswith('edit_source_'):
-            await self.start_edit_source(query, context)
-        else:
+        handler = self._exact_handlers.get(data)
+        if handler is None:
+            handler = next((h for prefix, h in self._prefix_handlers if data.startswith(prefix)), None)
+        if handler is None:
             await query.answer("Неизвестная команда.")
+            return
+
+        if data.startswith(self.BACKGROUND_CALLBACKS):
+            # Долгие операции идут фоновой задачей, чтобы обработчик сразу освободился для следующих нажатий
+            context.application.create_task(handler(update, context, query, data), update=update)
+        else:
+            await handler(update, context, query, data)
+
+    async def show_news_page(self, query, data, context: ContextTypes.DEFAULT_TYPE):
+        """Показывает страницу списка новостей из callback_data вида view_news_page_<номер>."""
+        try:
+            page = int(data.replace('view_news_page_', ''))
+            # Добавим защиту, чтобы страница не могла быть меньше 1
+            if page < 1:
+                page = 1
+            await self.show_pending_news(query, context, page=page)
+        except (ValueError, TypeError):
+            await query.answer("❌ Ошибка: неверный номер страницы.")
 
     async def delete_article_callback(self, query: Update, context: ContextTypes.DEFAULT_TYPE, data: str):
         """Обрабатывает нажатие кнопки удаления статьи."""
@@ -125,7 +198,7 @@ class NewsBot:
             article_id = int(data.replace('delete_article_', ''))
             
             # Удаляем статью из БД
-            success = self.db.delete_article(article_id)
+            success = await self.db.delete_article(article_id)
 
             if success:
                 await query.answer("✅ Новость удалена")
@@ -188,8 +261,7 @@ class NewsBot:
             await query.answer("⏳ Очищаю базу данных...")
             
             # Выполняем очистку в отдельном потоке, чтобы не блокировать бота
-            loop = asyncio.get_event_loop()
-            deleted_count = await loop.run_in_executor(None, self.db.clear_all_articles)
+            deleted_count = await self.db.clear_all_articles()
             
             text = f"✅ **База данных очищена!**\n\nУдалено статей: **{deleted_count}**"
             keyboard = [[InlineKeyboardButton("🔙 В главное меню", callback_data="main_menu")]]
@@ -242,7 +314,7 @@ class NewsBot:
 
         # 1. Получаем актуальные данные
         page_size = 15
-        articles, total_articles = self.db.get_pending_articles_paginated(page=page, page_size=page_size)
+        articles, total_articles = await self.db.get_pending_articles_paginated(page=page, page_size=page_size)
         
         total_pages = (total_articles + page_size - 1) // page_size
         if total_pages == 0: total_pages = 1
@@ -263,13 +335,13 @@ class NewsBot:
             
             keyboard = []
             for article in articles:
-                # Используем 'original_title', так как это ключ из БД для списка
-                title_text = article.get('original_title') or 'Без заголовка'
+                # Используем 'original_title', так как это колонка из БД для списка
+                title_text = article['original_title'] or 'Без заголовка'
                 # Ограничиваем заголовок до 50 символов, чтобы оставить место для кнопки удаления
                 short_title = title_text if len(title_text) < 50 else title_text[:47] + "..."
                 
                 # Создаем строку только с заголовком (занимает всю ширину)
-                keyboard.append([InlineKeyboardButton(short_title, callback_data=f"view_article_{article['id']}")])
+                keyboard.append([InlineKeyboardButton(short_title, callback_data=f"article_{article['id']}")])
 
             pagination_row = []
             if page > 1:
@@ -300,7 +372,7 @@ class NewsBot:
 
     async def send_article_for_review(self, context: ContextTypes.DEFAULT_TYPE, chat_id: int, article_id: int):
         """Отправляет новое сообщение со статьей на проверку."""
-        article = self.db.get_article_by_id(article_id)
+        article = await self._get_article(article_id)
         if not article:
             await context.bot.send_message(chat_id, "Не удалось найти статью.")
             return
@@ -309,31 +381,29 @@ class NewsBot:
         if not article['rewritten_title']:
             processing_message = await context.bot.send_message(chat_id, "⏳ Обрабатываю статью (текст и изображение)...")
             
-            rewritten = self.mistral.rewrite_news_article(
-                article['original_title'], 
-                article['original_content']
-            )
-            image_url = self.openai.generate_image(
-                rewritten['title'],
-                rewritten['content']
-            )
+            # Рерайт и генерация изображения независимы: запускаем их одновременно.
+            # Промпт картинки строится по исходному тексту, поэтому не ждет рерайта
+            async with self.mistral.rewrite_session() as rewrite:
+                rewritten, image_url = await asyncio.gather(
+                    rewrite(article['original_title'], article['original_content']),
+                    self.openai.generate_image(article['original_title'], article['original_content'])
+                )
             
-            self.db.update_article_rewrite(
-                article_id, rewritten['title'], rewritten['content'], rewritten['hashtags']
-            )
+            # Текст, подпись для Telegram и изображение сохраняем одним UPDATE
+            fields = {
+                'rewritten_title': rewritten['title'],
+                'rewritten_content': rewritten['content'],
+                'hashtags': rewritten['hashtags'],
+                'caption_head': article_caption_head(rewritten['title'], rewritten['content'], rewritten['hashtags']),
+            }
             if image_url: # Теперь это локальный путь
-                self.db.update_article_image(article_id, "", image_url) # Меняем местами URL и путь
+                fields.update(image_url="", image_path=image_url) # Меняем местами URL и путь
+            await self.db.finalize_article(article_id, **fields)
             
             await processing_message.delete()
-            article = self.db.get_article_by_id(article_id) # Получаем обновленные данные
+            article = await self._get_article(article_id) # Получаем обновленные данные
         
-        hashtags = json.loads(article['hashtags']) if article.get('hashtags') else []
-        
-        message = f"**{article['rewritten_title']}**\n\n"
-        message += f"{article['rewritten_content']}\n\n"
-        if hashtags:
-            message += " ".join(hashtags) + "\n\n"
-        message += f"🔗 Источник: {article['original_url']}"
+        message = self._format_article(article)
         
         keyboard = [
             [
@@ -351,34 +421,81 @@ class NewsBot:
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        image_path = article.get('image_path')
-        if image_path and os.path.exists(image_path):
-            try:
-                with open(image_path, 'rb') as photo_file:
-                    await context.bot.send_photo(
-                        chat_id=chat_id,
-                        photo=photo_file,
-                        caption=message,
-                        parse_mode=ParseMode.MARKDOWN,
-                        reply_markup=reply_markup
-                    )
-            finally:
-                # Удаляем файл после отправки
-                if os.path.exists(image_path):
-                    os.remove(image_path)
+        # Файл изображения не удаляем: кэш изображений может отдать тот же файл другим статьям
+        photo = await self._article_photo(article)
+        if photo is not None:
+            await self._send_article_photo(
+                context, article, photo,
+                chat_id=chat_id,
+                caption=message,
+                parse_mode=ParseMode.HTML,
+                reply_markup=reply_markup
+            )
         else:
             await context.bot.send_message(
                 chat_id=chat_id,
                 text=message,
-                parse_mode=ParseMode.MARKDOWN,
+                parse_mode=ParseMode.HTML,
                 reply_markup=reply_markup,
                 disable_web_page_preview=True
             )
 
+    @staticmethod
+    def _format_article(article: Dict) -> str:
+        """Текст статьи для отправки: сохраненный в БД caption или, для старых статей без него, собранный на месте."""
+        if article.get('caption'):
+            return article['caption']
+        return article_caption(
+            article['rewritten_title'],
+            article['rewritten_content'],
+            orjson.loads(article['hashtags']) if article.get('hashtags') else [],
+            article['original_url']
+        )
+
+    async def _article_photo(self, article: Dict) -> Optional[Union[str, bytes]]:
+        """
+        Фото статьи для send_photo: file_id изображения, уже загруженного в Telegram,
+        иначе содержимое локального файла (читается в потоке). None, если изображения нет.
+        """
+        if article.get('telegram_file_id'):
+            return article['telegram_file_id']
+        image_path = article.get('image_path')
+        return await asyncio.to_thread(self._read_image, image_path) if image_path else None
+
+    async def _send_article_photo(self, context: ContextTypes.DEFAULT_TYPE, article: Dict,
+                                  photo: Union[str, bytes], **kwargs):
+        """
+        Отправляет фото статьи. Если Telegram отклонил сохраненный file_id, фото загружается
+        заново из локального файла. После загрузки файла его file_id сохраняется в БД.
+        """
+        try:
+            sent = await context.bot.send_photo(photo=photo, **kwargs)
+        except BadRequest as e:
+            image_path = article.get('image_path')
+            if isinstance(photo, bytes) or not image_path:
+                raise
+            photo = await asyncio.to_thread(self._read_image, image_path)
+            if photo is None:
+                raise
+            logger.warning("file_id статьи %s отклонен Telegram (%s), загружаю файл заново", article['id'], e)
+            sent = await context.bot.send_photo(photo=photo, **kwargs)
+        if isinstance(photo, bytes):
+            # Дальше (публикация, повторный показ) отправляем по file_id, без загрузки файла
+            await self.db.finalize_article(article['id'], telegram_file_id=sent.photo[-1].file_id)
+        return sent
+
+    @staticmethod
+    def _read_image(image_path: str) -> Optional[bytes]:
+        """Читает файл изображения целиком (вызывается в потоке); None, если файла нет."""
+        try:
+            return Path(image_path).read_bytes()
+        except FileNotFoundError:
+            return None
+
     async def show_article_details(self, query, data, context: ContextTypes.DEFAULT_TYPE):
         """Показать детали статьи"""
         article_id = int(data.split("_")[1])
-        article = self.db.get_article_by_id(article_id)
+        article = await self._get_article(article_id)
         
         if not article:
             await query.edit_message_text("❌ Статья не найдена.")
@@ -394,7 +511,7 @@ class NewsBot:
     async def rewrite_article(self, query, data, context: ContextTypes.DEFAULT_TYPE):
         """Переписать статью (надежная версия)"""
         article_id = int(data.split("_")[1])
-        article = self.db.get_article_by_id(article_id)
+        article = await self._get_article(article_id)
         
         if not article:
             await query.answer("❌ Статья не найдена.", show_alert=True)
@@ -407,17 +524,16 @@ class NewsBot:
         )
         
         # Переписываем статью
-        rewritten = self.mistral.rewrite_news_article(
-            article['original_title'], 
-            article['original_content']
-        )
+        async with self.mistral.rewrite_session() as rewrite:
+            rewritten = await rewrite(article['original_title'], article['original_content'])
         
         # Сохраняем в базу
-        self.db.update_article_rewrite(
+        await self.db.update_article_rewrite(
             article_id, 
             rewritten['title'], 
             rewritten['content'],
-            rewritten['hashtags']
+            rewritten['hashtags'],
+            article_caption_head(rewritten['title'], rewritten['content'], rewritten['hashtags'])
         )
         
         # Удаляем временное сообщение "Переписываю..."
@@ -429,7 +545,7 @@ class NewsBot:
     async def generate_new_image(self, query, data, context: ContextTypes.DEFAULT_TYPE):
         """Сгенерировать новое изображение (надежная версия)"""
         article_id = int(data.split("_")[1])
-        article = self.db.get_article_by_id(article_id)
+        article = await self._get_article(article_id)
         
         if not article:
             await query.answer("❌ Статья не найдена.", show_alert=True)
@@ -443,13 +559,15 @@ class NewsBot:
         )
         
         # Генерируем новое изображение
-        image_path = self.openai.generate_image(
+        # Пользователь просит именно новое изображение, поэтому кэш не используем
+        image_path = await self.openai.generate_image(
             article['rewritten_title'] or article['original_title'], 
-            article['rewritten_content'] or article['original_content']
+            article['rewritten_content'] or article['original_content'],
+            use_cache=False
         )
         
         if image_path:
-            self.db.update_article_image(article_id, "", image_path) # Сохраняем локальный путь
+            await self.db.update_article_image(article_id, "", image_path) # Сохраняем локальный путь
         else:
             await processing_message.edit_text("❌ Не удалось сгенерировать изображение. Показываю статью со старым изображением.")
             await asyncio.sleep(2)
@@ -468,48 +586,36 @@ class NewsBot:
             await query.answer("❌ ID канала для публикации (TARGET_CHANNEL_ID) не настроен!", show_alert=True)
             return
 
-        article = self.db.get_article_by_id(article_id)
+        article = await self._get_article(article_id)
         if not article:
             await query.answer("❌ Не могу найти статью для публикации.", show_alert=True)
             return
 
         # Формируем финальный пост
-        hashtags = json.loads(article['hashtags']) if article.get('hashtags') else []
-        
-        message = f"**{article['rewritten_title']}**\n\n"
-        message += f"{article['rewritten_content']}\n\n"
-        if hashtags:
-            message += " ".join(hashtags) + "\n\n"
-        message += f"🔗 Источник: {article['original_url']}"
+        message = self._format_article(article)
 
         try:
-            await query.answer("⏳ Публикую...")
-            image_path = article.get('image_path')
+            photo = await self._article_photo(article)
             
-            if image_path and os.path.exists(image_path):
-                with open(image_path, 'rb') as photo_file:
-                    await context.bot.send_photo(
-                        chat_id=TARGET_CHANNEL_ID,
-                        photo=photo_file,
-                        caption=message,
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-                # Удаляем файл после успешной публикации
-                try:
-                    os.remove(image_path)
-                except OSError as e:
-                    logger.warning(f"Не удалось удалить файл изображения {image_path}: {e}")
+            if photo is not None:
+                # Файл остается на диске: его могут использовать другие статьи, удаляет его плановая очистка
+                await self._send_article_photo(
+                    context, article, photo,
+                    chat_id=TARGET_CHANNEL_ID,
+                    caption=message,
+                    parse_mode=ParseMode.HTML
+                )
             else:
                 # Если изображения нет, отправляем только текст
                 await context.bot.send_message(
                     chat_id=TARGET_CHANNEL_ID,
                     text=message,
-                    parse_mode=ParseMode.MARKDOWN,
+                    parse_mode=ParseMode.HTML,
                     disable_web_page_preview=True
                 )
             
             # Обновляем статус статьи в БД
-            self.db.update_article_status(article_id, 'published')
+            await self.db.update_article_status(article_id, 'published')
             await query.delete_message() # Удаляем старое сообщение
             
             # Информируем админа и показываем следующую статью
@@ -524,7 +630,7 @@ class NewsBot:
             return # Прерываем выполнение в случае ошибки
 
         # Показываем следующую статью или возвращаемся в меню
-        articles = self.db.get_pending_articles()
+        articles = await self._get_pending_articles()
         if articles:
             await self.send_article_for_review(context, query.message.chat_id, articles[0]['id'])
         else:
@@ -538,13 +644,18 @@ class NewsBot:
         """Отклонить статью"""
         article_id = int(data.split("_")[1])
         
-        self.db.update_article_status(article_id, 'rejected')
-        
-        await query.delete_message()
-        await context.bot.send_message(query.message.chat_id, "❌ Статья отклонена.")
+        # UPDATE статуса идет в потоке параллельно с запросами к Telegram
+        status_update = asyncio.create_task(self.db.update_article_status(article_id, 'rejected'))
+        try:
+            await query.delete_message()
+            await context.bot.send_message(query.message.chat_id, "❌ Статья отклонена.")
+        finally:
+            # Задача дожидается и при ошибке Telegram: статус записан, ошибка записи не теряется.
+            # Следующую статью выбираем только после записи, иначе снова покажем отклоненную
+            await status_update
         
         # Показываем следующую статью
-        articles = self.db.get_pending_articles()
+        articles = await self._get_pending_articles()
         if articles:
             await self.send_article_for_review(context, query.message.chat_id, articles[0]['id'])
         else:
@@ -556,16 +667,16 @@ class NewsBot:
 
     async def manage_sources(self, query):
         """Показать управление источниками"""
-        sources = self.db.get_news_sources(active_only=False)
+        sources = await self.db.get_news_sources(active_only=False)
         
         keyboard = []
         for source in sources:
-            status = "✅" if source.get('is_active', 1) else "❌"
+            status = "✅" if source.is_active else "❌"
             # Теперь вся строка - это кнопка для просмотра деталей
             keyboard.append([
                 InlineKeyboardButton(
-                    f"{status} {source['name']}", 
-                    callback_data=f"view_source_{source['id']}"
+                    f"{status} {source.name}", 
+                    callback_data=f"view_source_{source.id}"
                 )
             ])
         
@@ -599,16 +710,16 @@ class NewsBot:
             await query.answer("❌ Неверный ID источника.", show_alert=True)
             return
 
-        source = self.db.get_source_by_id(source_id)
+        source = await self.db.get_source_by_id(source_id)
 
         if not source:
             await query.answer("❌ Источник не найден.", show_alert=True)
             return
 
         text = (
-            f"**Источник:** `{source['name']}`\n"
-            f"**Тип:** `{source['source_type']}`\n"
-            f"**URL:** `{source['url']}`"
+            f"**Источник:** `{source.name}`\n"
+            f"**Тип:** `{source.source_type}`\n"
+            f"**URL:** `{source.url}`"
         )
 
         keyboard = [
@@ -640,14 +751,14 @@ class NewsBot:
             await query.answer("❌ Неверный формат ID источника.", show_alert=True)
             return
         
-        source = self.db.get_source_by_id(source_id)
+        source = await self.db.get_source_by_id(source_id)
         if not source:
             await query.answer("❌ Источник не найден.", show_alert=True)
             return
 
         try:
-            self.db.delete_news_source(source_id)
-            await query.answer(f"✅ Источник '{source['name']}' удален.")
+            await self.db.delete_news_source(source_id)
+            await query.answer(f"✅ Источник '{source.name}' удален.")
         except Exception as e:
             logger.error(f"Ошибка при удалении источника {source_id}: {e}")
             await query.answer("❌ Произошла ошибка при удалении.", show_alert=True)
@@ -657,38 +768,14 @@ class NewsBot:
 
     def normalize_url(self, url: str) -> str:
         """
-        Агрессивно нормализует URL для максимальной унификации:
-        - Убирает схему (http/https)
-        - Убирает 'www.'
-        - Убирает параметры и фрагменты
-        - Убирает конечный слэш
+        Агрессивно нормализует URL для максимальной унификации (схема, 'www.', параметры,
+        фрагмент и конечный слэш отбрасываются). Та же нормализация, что у статей в БД:
+        быстрый разбор регулярным выражением и общий LRU-кэш Database.
         """
-        if not url:
-            return ""
-        try:
-            # Сначала убираем схему для лучшей унификации
-            if url.startswith(('http://', 'https://')):
-                url = url.split('://', 1)[1]
-            
-            # Убираем www.
-            if url.startswith('www.'):
-                url = url.split('www.', 1)[1]
-
-            # Используем urlparse для остального
-            parsed = urlparse('http://' + url) # Добавляем временную схему для парсинга
-            path = parsed.path.rstrip('/')
-            
-            # Собираем без схемы
-            normalized = f"{parsed.netloc}{path}".lower()
-            return normalized
-        except Exception as e:
-            logger.warning(f"Не удалось нормализовать URL '{url}': {e}")
-            return url.lower()
+        return self.db.sync.normalize_url(url)
 
     async def check_sources(self, query, context: ContextTypes.DEFAULT_TYPE):
         """Запускает принудительную проверку источников и сообщает результат."""
-        await query.answer("⏳ Запускаю проверку источников... Это может занять некоторое время.")
-        
         # Редактируем сообщение, чтобы показать, что идет работа
         try:
             await query.edit_message_text(
@@ -701,10 +788,7 @@ class NewsBot:
                 raise
 
         # Запускаем тяжелую задачу в отдельном потоке
-        loop = asyncio.get_event_loop()
-        results = await loop.run_in_executor(
-            None, self.scheduler.force_check_sources
-        )
+        results = await asyncio.to_thread(self.scheduler.force_check_sources)
 
         # Сообщаем результат и снова показываем меню
         total = results.get('total', 0)
@@ -749,15 +833,7 @@ class NewsBot:
     
     def get_main_menu_keyboard(self):
         """Возвращает клавиатуру главного меню."""
-        keyboard = [
-            [InlineKeyboardButton("📰 Просмотреть новости", callback_data="view_news")],
-            [InlineKeyboardButton("⚙️ Управление источниками", callback_data="manage_sources")],
-            [InlineKeyboardButton("🔑 Управление словами", callback_data="manage_keywords")],
-            [InlineKeyboardButton("🔄 Проверить источники", callback_data="check_sources")],
-            [InlineKeyboardButton("📊 Статистика", callback_data="statistics")],
-            [InlineKeyboardButton("🗑️ Очистить базу данных", callback_data="clear_database")]
-        ]
-        return InlineKeyboardMarkup(keyboard)
+        return MAIN_MENU_MARKUP
 
     # --- Начало блока ConversationHandler для добавления источника ---
 
@@ -823,7 +899,7 @@ class NewsBot:
         normalized_url = self.normalize_url(url)
         
         try:
-            source_id = self.db.add_news_source(name, normalized_url, source_type)
+            source_id = await self.db.add_news_source(name, normalized_url, source_type)
             message = (
                 f"✅ Источник успешно добавлен!\n\n"
                 f"**Название:** {name}\n"
@@ -897,13 +973,13 @@ class NewsBot:
 
         try:
             if field_to_edit == 'name':
-                self.db.update_source_details(source_id, name=new_value)
+                await self.db.update_source_details(source_id, name=new_value)
             elif field_to_edit == 'url':
                 if not new_value.startswith('http'):
                     await update.message.reply_text("Это не похоже на ссылку. URL должен начинаться с http или https. Попробуйте снова.")
                     return EDIT_SOURCE_URL
                 normalized_url = self.normalize_url(new_value)
-                self.db.update_source_details(source_id, url=normalized_url)
+                await self.db.update_source_details(source_id, url=normalized_url)
             
             await update.message.reply_text("✅ Данные источника успешно обновлены!", reply_markup=keyboard)
 
@@ -933,7 +1009,7 @@ class NewsBot:
         query = update.callback_query
         await query.answer()
 
-        keywords = self.db.get_keywords()
+        keywords = await self.db.get_keywords()
         text = "🔑 **Управление ключевыми словами**\n\n"
         if keywords:
             text += "Текущие слова:\n`" + "`, `".join(keywords) + "`\n\n"
@@ -961,7 +1037,7 @@ class NewsBot:
     async def add_keyword(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Добавляет ключевое слово в базу."""
         keyword = update.message.text.strip().lower()
-        if self.db.add_keyword(keyword):
+        if await self.db.add_keyword(keyword):
             await update.message.reply_text(f"✅ Слово '{keyword}' успешно добавлено.")
         else:
             await update.message.reply_text(f"⚠️ Слово '{keyword}' уже существует.")
@@ -975,7 +1051,7 @@ class NewsBot:
         query = update.callback_query
         await query.answer()
         
-        keywords = self.db.get_keywords()
+        keywords = await self.db.get_keywords()
         if not keywords:
             await query.edit_message_text("Нечего удалять. Список ключевых слов пуст.", reply_markup=self.get_back_to_menu_keyboard())
             return ConversationHandler.END
@@ -990,11 +1066,10 @@ class NewsBot:
     async def delete_keyword(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Удаляет выбранное ключевое слово."""
         query = update.callback_query
-        await query.answer()
         
         keyword_to_delete = query.data.split("_")[1]
         
-        if self.db.delete_keyword(keyword_to_delete):
+        if await self.db.delete_keyword(keyword_to_delete):
             await query.answer(f"✅ Слово '{keyword_to_delete}' удалено.")
         else:
             await query.answer(f"❌ Не удалось удалить слово '{keyword_to_delete}'.", show_alert=True)
@@ -1016,8 +1091,7 @@ class NewsBot:
     
     def get_back_to_menu_keyboard(self):
         """Возвращает клавиатуру с одной кнопкой 'Назад в меню'."""
-        keyboard = [[InlineKeyboardButton("🔙 Назад в меню", callback_data="main_menu")]]
-        return InlineKeyboardMarkup(keyboard)
+        return BACK_TO_MENU_MARKUP
 
     @admin_only
     async def handle_unknown_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1032,7 +1106,15 @@ class NewsBot:
         if not TELEGRAM_BOT_TOKEN:
             raise ValueError("TELEGRAM_BOT_TOKEN не установлен в переменных окружения")
         
-        application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+        # Все запросы к Bot API проходят через ограничитель: не больше SEND_RATE_PER_SECOND в секунду,
+        # ответ 429 (flood control) повторяется после паузы из retry_after вместо ошибки
+        rate_limiter = AIORateLimiter(
+            overall_max_rate=self.SEND_RATE_PER_SECOND, overall_time_period=1, max_retries=self.SEND_MAX_RETRIES
+        )
+        application = (
+            Application.builder().token(TELEGRAM_BOT_TOKEN).rate_limiter(rate_limiter)
+            .post_shutdown(self._post_shutdown).build()
+        )
         
         # Создаем ConversationHandler для диалога добавления источника
         add_source_conv_handler = ConversationHandler(
@@ -1088,6 +1170,10 @@ class NewsBot:
         # Запускаем бота
         application.run_polling()
 
+    async def _post_shutdown(self, application: Application):
+        """Закрывает общие HTTP-клиенты генерации изображений, пока event loop бота еще работает."""
+        await self.openai.aclose()
+
     async def show_main_menu_from_update(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         await self.show_main_menu(update.callback_query, context)
         return ConversationHandler.END
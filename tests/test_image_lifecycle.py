@@ -0,0 +1,110 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from telegram.error import BadRequest
+
+import openai_client
+from database import Database
+from openai_client import OpenAIClient
+from telegram_bot import NewsBot
+
+
+class FakeBot:
+    """Заглушка context.bot: запоминает отправленные сообщения и выдает file_id на каждое фото."""
+
+    def __init__(self, expired_file_ids=()):
+        self.photos = []
+        self.messages = []
+        self.expired_file_ids = set(expired_file_ids)
+
+    async def send_photo(self, chat_id, photo, **kwargs):
+        if photo in self.expired_file_ids:
+            raise BadRequest("Wrong file identifier/http url specified")
+        self.photos.append(photo)
+        return SimpleNamespace(photo=[SimpleNamespace(file_id=f"file-{len(self.photos)}")])
+
+    async def send_message(self, chat_id, text=None, **kwargs):
+        self.messages.append(text)
+
+
+class SharedImageTest(unittest.TestCase):
+    """Две статьи получили из кэша изображений один и тот же файл."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.db = Database(os.path.join(self.tmp, 'news_bot.db'))
+        self.addCleanup(self.db.close)
+        self.db.add_news_articles_bulk([
+            (None, 'Первая', 'Текст', 'https://example.com/news/1'),
+            (None, 'Вторая', 'Текст', 'https://example.com/news/2'),
+        ])
+
+        self.image_path = os.path.join(self.tmp, 'images', 'ab', 'shared.png')
+        os.makedirs(os.path.dirname(self.image_path))
+        Path(self.image_path).write_bytes(b'png-bytes')
+        self.db.add_cached_image('prompt-hash', None, self.image_path)
+
+        self.article_ids = [article['id'] for article in self.db.get_pending_articles(limit=2)]
+        for article_id in self.article_ids:
+            self.db.finalize_article(
+                article_id, rewritten_title='T', rewritten_content='C', hashtags=[],
+                image_url="", image_path=self.image_path
+            )
+        self.bot = NewsBot(self.db, None, None, None)
+        self.context = SimpleNamespace(bot=FakeBot())
+
+    def review(self, article_id):
+        asyncio.run(self.bot.send_article_for_review(self.context, 1, article_id))
+
+    def test_review_keeps_shared_file_for_other_article(self):
+        first, second = self.article_ids
+        self.review(first)
+        self.assertTrue(os.path.exists(self.image_path))
+
+        self.review(second)
+        self.assertEqual(self.context.bot.photos, [b'png-bytes', b'png-bytes'])
+        self.assertEqual(self.context.bot.messages, [])
+
+    def test_expired_file_id_falls_back_to_file(self):
+        first, _ = self.article_ids
+        self.db.finalize_article(first, telegram_file_id='expired')
+        self.context = SimpleNamespace(bot=FakeBot(expired_file_ids={'expired'}))
+
+        self.review(first)
+        self.assertEqual(self.context.bot.photos, [b'png-bytes'])
+        # Вместо отклоненного file_id сохранен новый
+        self.assertEqual(self.db.get_article_by_id(first)['telegram_file_id'], 'file-1')
+
+    def test_cleanup_removes_file_only_without_references(self):
+        # Ключ API читается из окружения при импорте openai_client
+        with mock.patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'}), \
+                mock.patch.object(openai_client, 'OPENAI_API_KEY', 'test-key'):
+            client = OpenAIClient(self.db, images_dir=os.path.join(self.tmp, 'images'))
+        old = time.time() - 2 * OpenAIClient.UNUSED_IMAGE_MIN_AGE
+        os.utime(self.image_path, (old, old))
+
+        first, second = self.article_ids
+        self.db.delete_article(first)
+        self.assertEqual(client.delete_unused_images(), 0)
+
+        self.db.delete_article(second)
+        self.assertEqual(client.delete_unused_images(), 0)
+
+        # Запись кэша устарела и удаляется ежедневной очисткой, после нее файл больше никому не нужен
+        with self.db._writer() as cursor:
+            cursor.execute("UPDATE image_cache SET created_at = 0")
+        self.db.delete_old_articles(days_old=7)
+        self.assertEqual(client.delete_unused_images(), 1)
+        self.assertFalse(os.path.exists(self.image_path))
+
+
+if __name__ == '__main__':
+    unittest.main()